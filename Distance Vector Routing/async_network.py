@@ -0,0 +1,157 @@
+from heapq import heappush, heappop
+
+from network import Network, protocol_str
+
+
+class AsyncNetwork(Network):
+    '''
+    Asynchronous, event driven take on Network. There are no rounds: a router sends its distance vector to its
+    neighbors as messages whenever the vector changes, every message takes the latency of its link to arrive, and a
+    router only does any work when messages arrive. Links are FIFO: a message never arrives before one sent earlier
+    over the same link in the same direction, even if the link's latency dropped in between, as the older vector would
+    otherwise overwrite the newer one. Messages are kept in a priority queue by arrival time. The protocol
+    logic itself is the same Router/RoutingTable code the synchronous engine uses.
+
+    At time 0 every router sends its vector to its neighbors. Events happen at their time, before the messages that
+    arrive at the same time. Both ends of a link an event touched recalculate their vectors and, if the link is up, send
+    them over it. Messages that were on a link when it went down are lost.
+
+    Times are in the unit of the link latencies, which is 1 for every link by default. A count to infinity error is
+    reported once messages are still going round round_budget time units after the last event. The convergence delay
+    is the time from the last event to the last change in any router's vector. Hooks get event_applied and
+    router_changed with the time instead of a round, round_start and round_end are never called. Checkpoints and the
+    converged state cache are not supported, since the messages in flight are part of the state, and neither is
+    detect_count_to_infinity, whose detector compares the routers' states round by round (a ValueError is raised if it
+    is asked for). The details are written for every time a router changed, details_every and details_changed_only are
+    for rounds and are not used.
+    '''
+    supports_checkpoints = False
+
+    def __init__(self, topology, protocol, detailed=True, latency=1, **network_options):
+        '''
+        :param latency: number, or a function of (router, router, cost) giving the latency of that link
+        Everything else is the same as for Network.
+        '''
+        super(AsyncNetwork, self).__init__(topology, protocol, detailed, **network_options)
+        if (self._detector is not None):
+            raise ValueError('the async engine does not support detect_count_to_infinity')
+        self._latency = latency if callable(latency) else (lambda n1, n2, cost: latency)
+        # Messages in flight, as (arrival time, order sent, src, dst, link epoch, vector)
+        self._messages = []
+        self._sent = 0
+        # Bumped every time a link goes down, so messages sent over an earlier incarnation of a link are dropped
+        self._link_epoch = {}
+        # Arrival time of the last message sent from src to dst, by (src, dst)
+        self._last_arrival = {}
+        self.messages_delivered = 0
+
+    def _send(self, now, src, dst):
+        '''
+        Puts the current vector of src for dst on the link between them
+        :param now: time
+        :param src: int
+        :param dst: int
+        :return: None
+        '''
+        link = (min(src, dst), max(src, dst))
+        vector = self.routers[src].get_distance_vector_for(dst)
+        arrival = now + self._latency(src, dst, self.topology.get_cost(src, dst))
+        # Never before the message sent ahead of it, ties are delivered in the order they were sent
+        arrival = max(arrival, self._last_arrival.get((src, dst), arrival))
+        self._last_arrival[(src, dst)] = arrival
+        heappush(self._messages, (arrival, self._sent, src, dst, self._link_epoch.get(link, 0), vector))
+        self._sent += 1
+
+    def _send_to_neighbors(self, now, src):
+        for n in self.routers[src].get_neighbor_nums():
+            self._send(now, src, n)
+
+    def simulate(self):
+        '''
+        Delivers messages and makes events happen in time order until no messages are left and no events are waiting
+        to happen. Will take care of adding details to self.details.
+        :return: None
+        '''
+        for i in self.routers:
+            self._send_to_neighbors(0, i)
+        last_change = 0
+
+        while (len(self._messages) or len(self._events)):
+            next_event = self._events.peek_time()
+            now = self._messages[0][0] if len(self._messages) else next_event
+            if (next_event is not None and next_event <= now):
+                now = next_event
+            elif (now - self._last_event_time >= self.round_budget):
+                self.count_to_infinity_error = True
+                break
+            self.round = now
+
+            # Destinations each router has to recalculate (None for all of them) and links to send vectors over
+            dirty = {}
+            links_up = []
+            due = self._events.pop_due(now)
+            if (len(due)):
+                self._last_event_time = now
+                for e in due:
+                    n1, n2 = e.link
+                    link = (min(n1, n2), max(n1, n2))
+                    if (e.cost == -1):
+                        # The messages on the link are lost, so new ones do not have to wait for them
+                        self._link_epoch[link] = self._link_epoch.get(link, 0) + 1
+                        self._last_arrival.pop((n1, n2), None)
+                        self._last_arrival.pop((n2, n1), None)
+                    dirty[n1] = dirty[n2] = None
+                    links_up.append(link)
+                self._enact_events(due)
+
+            while (len(self._messages) and self._messages[0][0] == now):
+                _, _, src, dst, epoch, vector = heappop(self._messages)
+                link = (min(src, dst), max(src, dst))
+                if (epoch != self._link_epoch.get(link, 0) or self.topology.get_cost(src, dst) == -1):
+                    continue
+                self.messages_delivered += 1
+                changed = self.routers[dst].receive_distance_vector_changes(src, vector)
+                if (len(changed) and dirty.get(dst, ()) is not None):
+                    dirty.setdefault(dst, set()).update(changed)
+
+            changed_routers = []
+            for i in sorted(dirty):
+                changed = self.routers[i].update_destinations(dirty[i])
+                if (len(changed)):
+                    changed_routers.append(i)
+                    self._forget_rows((i,))
+                    self._send_to_neighbors(now, i)
+                    for hook in self._hooks:
+                        hook.router_changed(self, now, i, changed)
+            changed_set = set(changed_routers)
+            for n1, n2 in links_up:
+                if (n1 != n2 and self.topology.get_cost(n1, n2) != -1):
+                    for src, dst in ((n1, n2), (n2, n1)):
+                        if (src not in changed_set):
+                            self._send(now, src, dst)
+
+            if (len(changed_routers)):
+                last_change = now
+                if (self.detailed):
+                    self._add_str('Time ' + str(now) + "\n-----------------------------------------------------------")
+                    for i in changed_routers:
+                        self._write_details("\t" + self._row_str(i) + '\n')
+                    self._add_str("")
+                    if (self.output_format != 'text'):
+                        self._emit_details(self._format_tables(now))
+
+        if (self.count_to_infinity_error):
+            self._write_details("\nCount to infinity error\n")
+        self.rounds = self.round
+        self.convergence_delay = str(max(last_change - self._last_event_time, 0))
+        self._add_details(protocol_str[self.protocol] + ' (Final Output):\n')
+        if (self.detailed and self.output_format != 'text'):
+            self._emit_details(self._format_tables('final'))
+        self._validate_routes()
+
+    def _convergence_str(self):
+        '''
+        Returns the line of the output with the convergence delay, which is in time units rather than rounds
+        :return: str
+        '''
+        return "Convergence Delay: " + self.convergence_delay + " time units.\n"
@@ -0,0 +1,191 @@
+'''
+Runs many scenarios (topology/events pairs) in one go, across a pool of worker processes that stay alive for the whole
+batch. Each worker parses a topology file once and reuses it for every scenario on that topology.
+
+The manifest is a JSON lines file with one scenario per line:
+    {"topology": "net.txt", "events": "flaps.txt", "protocols": ["basic", "poison-reverse"], "output": "out/1.txt"}
+
+topology and events are required, everything else is optional:
+    name       - name of the scenario in the results (default: its line number in the manifest)
+    protocols  - list of protocols to simulate, by number (0-2) or name (default: all three)
+    engine     - "object", "matrix" or "async" (default: object). The partitioned engine starts worker processes of its
+                 own, which the batch's worker processes can not do
+    incremental - use the incremental round mode (default: false)
+    round_budget - rounds without an event before a count to infinity error is reported (default: 100)
+    detect_count_to_infinity - report count to infinity errors as soon as they are certain, not with the async engine
+                 (default: false)
+    warm_start - start from the shortest paths when the network converges before its first event (default: false)
+    validate   - check the final routing tables against the shortest paths (default: false)
+    output     - file to write the final output to, in the format of output.txt
+    details    - file to write the detailed output to, in the format of detailed-output.txt (.gz to compress it)
+Relative paths are relative to the manifest.
+
+Usage: python batch.py <manifest> [--jobs <n>] [--results <file>] [--cache <directory>]
+
+The results file is a CSV with one row per scenario and protocol. With --cache, the state each topology converges to
+is kept in the given directory (see state_cache.py), and scenarios whose first event comes after it start from there.
+route_errors is the number of routes that differ from the shortest paths, for scenarios that are validated. A scenario
+that can not be run (a missing file, an unknown engine) or a protocol whose simulation fails gets a row with the error,
+and the rest of the batch goes on.
+'''
+import argparse
+import csv
+import json
+import os
+import sys
+from multiprocessing import Pool, cpu_count
+from timeit import default_timer
+
+from details_writer import open_details_writer
+from event import file_to_events
+from network import simulate_protocol, write_output, protocol_str, protocol_num, DETAILS_HEADER, DETAILS_FOOTER
+from simulation import network_class as engine_network_class
+from state_cache import ConvergedStateCache
+from topology import file_to_topology
+
+RESULT_FIELDS = ['name', 'topology', 'events', 'protocol', 'engine', 'routers', 'rounds', 'convergence_delay',
+                 'count_to_infinity_error', 'route_errors', 'seconds', 'error']
+
+# Topologies parsed by this worker process, by file name
+_topologies = {}
+
+
+def _get_topology(file_name):
+    '''
+    Returns the parsed topology in file_name, parsing it only the first time this process sees it.
+    :param file_name: str
+    :return: Topology
+    '''
+    mtime = os.path.getmtime(file_name)
+    if (file_name not in _topologies or _topologies[file_name][0] != mtime):
+        with open(file_name) as f:
+            _topologies[file_name] = (mtime, file_to_topology(f))
+    return _topologies[file_name][1]
+
+
+def run_scenario(scenario):
+    '''
+    Simulates a single scenario of the manifest and writes its output files.
+    :param scenario: dict - a manifest line, with its paths already resolved and the cache directory (if any)
+    :return: [dict...] - one results row per protocol
+    '''
+    base_row = {'name': scenario['name'], 'topology': scenario['topology'], 'events': scenario['events'],
+                'engine': scenario.get('engine', 'object')}
+
+    try:
+        options = {'incremental': bool(scenario.get('incremental', False)),
+                   'round_budget': int(scenario.get('round_budget', 100)),
+                   'detect_count_to_infinity': bool(scenario.get('detect_count_to_infinity', False)),
+                   'warm_start': bool(scenario.get('warm_start', False)),
+                   'validate': bool(scenario.get('validate', False))}
+        if (base_row['engine'] == 'partitioned'):
+            raise ValueError('the partitioned engine can not run in batch worker processes')
+        network_class = engine_network_class(base_row['engine'])
+        protocols = [protocol_num(p) for p in scenario.get('protocols', range(len(protocol_str)))]
+        for protocol in protocols:
+            if (not 0 <= protocol < len(protocol_str)):
+                raise ValueError('unknown protocol: ' + str(protocol))
+        topology = _get_topology(scenario['topology'])
+        with open(scenario['events']) as f:
+            events = file_to_events(f)
+    except (IOError, OSError, ValueError) as e:
+        return [dict(base_row, error=str(e))]
+
+    cache = ConvergedStateCache(scenario['cache']) if scenario.get('cache') else None
+    details = None
+    if (scenario.get('details')):
+        try:
+            details = open_details_writer(scenario['details'])
+        except (IOError, OSError) as e:
+            return [dict(base_row, error=str(e))]
+        options['details_sink'] = details
+    rows = []
+    networks = []
+    try:
+        for protocol in protocols:
+            start = default_timer()
+            if (details is not None):
+                details.write(protocol_str[protocol] + DETAILS_HEADER)
+            try:
+                n = simulate_protocol(network_class, topology, events, protocol, details is not None, options, cache)
+            except Exception as e:
+                # One failing simulation should not take the rest of the batch down with it
+                if (details is not None):
+                    details.write(DETAILS_FOOTER)
+                rows.append(dict(base_row, protocol=protocol_str[protocol], seconds=default_timer() - start,
+                                 error='%s: %s' % (type(e).__name__, e)))
+                continue
+            if (details is not None):
+                details.write(DETAILS_FOOTER)
+            networks.append(n)
+            rows.append(dict(base_row, protocol=protocol_str[protocol], routers=n.N, rounds=n.rounds,
+                             convergence_delay='' if n.count_to_infinity_error else n.convergence_delay,
+                             count_to_infinity_error=int(n.count_to_infinity_error),
+                             route_errors='' if n.route_errors is None else len(n.route_errors),
+                             seconds=default_timer() - start, error=''))
+    finally:
+        if (details is not None):
+            details.close()
+
+    if (scenario.get('output')):
+        try:
+            with open(scenario['output'], 'w') as f:
+                write_output(f, networks)
+        except (IOError, OSError) as e:
+            for row in rows:
+                row['error'] = row['error'] or str(e)
+    return rows
+
+
+def read_manifest(file_name):
+    '''
+    Reads the scenarios of a manifest, resolving their paths relative to it.
+    :param file_name: str
+    :return: [dict...]
+    '''
+    directory = os.path.dirname(os.path.abspath(file_name))
+    scenarios = []
+    with open(file_name) as f:
+        for line_num, line in enumerate(f, 1):
+            if (len(line.strip()) == 0):
+                continue
+            scenario = json.loads(line)
+            scenario.setdefault('name', str(line_num))
+            for key in ('topology', 'events', 'output', 'details'):
+                if (scenario.get(key)):
+                    scenario[key] = os.path.join(directory, scenario[key])
+            scenarios.append(scenario)
+    return scenarios
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Run a manifest of distance vector scenarios.')
+    parser.add_argument('manifest', help='JSON lines file with one scenario per line')
+    parser.add_argument('--jobs', type=int, default=cpu_count(), help='number of worker processes')
+    parser.add_argument('--results', help='CSV file to write the results to (default: stdout)')
+    parser.add_argument('--cache', help='directory to cache converged states in')
+    args = parser.parse_args(argv)
+
+    scenarios = read_manifest(args.manifest)
+    for scenario in scenarios:
+        scenario['cache'] = args.cache
+    # Scenarios on the same topology are handed out together, so a worker mostly reuses the topology it parsed
+    scenarios.sort(key=lambda scenario: scenario['topology'])
+
+    out = open(args.results, 'w') if args.results else sys.stdout
+    writer = csv.DictWriter(out, RESULT_FIELDS)
+    writer.writerow(dict((f, f) for f in RESULT_FIELDS))
+    pool = Pool(max(1, args.jobs))
+    try:
+        chunk_size = max(1, len(scenarios) // (max(1, args.jobs) * 4))
+        for rows in pool.imap(run_scenario, scenarios, chunk_size):
+            writer.writerows(rows)
+    finally:
+        pool.close()
+        pool.join()
+        if (out is not sys.stdout):
+            out.close()
+
+
+if (__name__ == "__main__"):
+    main(sys.argv[1:])
@@ -0,0 +1,295 @@
+'''
+Benchmarks for the distance vector simulator. Generates synthetic topologies and event traces, runs files_to_network
+on them (all three protocols) and reports timings as JSON lines, one record per case and protocol, so runs can be
+compared to catch regressions.
+
+Example:
+    python benchmark.py --kinds ring,grid --sizes 50,200 --events 20 --engines object,matrix --output results.jsonl
+'''
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+from multiprocessing import Pool
+from timeit import default_timer
+
+from network import files_to_network, protocol_str
+from simulation import network_class as engine_network_class
+
+
+def ring_topology(N, rng, max_cost):
+    '''
+    Returns the links of a ring of N routers
+    :param N: int
+    :param rng: random.Random
+    :param max_cost: int
+    :return: [(int, int, int)...]
+    '''
+    return [(i, i % N + 1, rng.randint(1, max_cost)) for i in range(1, N + 1) if (N > 2 or i < N)]
+
+
+def grid_topology(N, rng, max_cost):
+    '''
+    Returns the links of a square grid of N routers (the last row may be incomplete)
+    :param N: int
+    :param rng: random.Random
+    :param max_cost: int
+    :return: [(int, int, int)...]
+    '''
+    side = int(math.ceil(math.sqrt(N)))
+    links = []
+    for i in range(1, N + 1):
+        if (i % side != 0 and i + 1 <= N):
+            links.append((i, i + 1, rng.randint(1, max_cost)))
+        if (i + side <= N):
+            links.append((i, i + side, rng.randint(1, max_cost)))
+    return links
+
+
+def geometric_topology(N, rng, max_cost, degree=6):
+    '''
+    Returns the links of a random geometric graph: routers are dropped in the unit square and linked to every router
+    within a radius chosen to give the requested average degree. The graph is not necessarily connected.
+    :param N: int
+    :param rng: random.Random
+    :param max_cost: int
+    :param degree: int - average degree
+    :return: [(int, int, int)...]
+    '''
+    radius = math.sqrt(degree / (math.pi * max(N, 1)))
+    cells = max(1, int(1 / radius))
+    points = [(rng.random(), rng.random()) for _ in range(N)]
+    buckets = {}
+    for i, (x, y) in enumerate(points):
+        buckets.setdefault((int(x * cells), int(y * cells)), []).append(i)
+
+    links = []
+    for i, (x, y) in enumerate(points):
+        cx, cy = int(x * cells), int(y * cells)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in buckets.get((cx + dx, cy + dy), ()):
+                    if (j > i and (points[j][0] - x) ** 2 + (points[j][1] - y) ** 2 <= radius ** 2):
+                        links.append((i + 1, j + 1, rng.randint(1, max_cost)))
+    return links
+
+
+def scale_free_topology(N, rng, max_cost, m=2):
+    '''
+    Returns the links of a Barabasi-Albert scale-free graph where every new router links to m existing routers,
+    picked with probability proportional to their degree.
+    :param N: int
+    :param rng: random.Random
+    :param max_cost: int
+    :param m: int
+    :return: [(int, int, int)...]
+    '''
+    links = []
+    # Every router appears in ends once per link it has, so picking from it is picking proportionally to degree
+    ends = []
+    for i in range(2, N + 1):
+        targets = set()
+        if (len(ends) == 0):
+            targets.add(1)
+        while (len(targets) < min(m, i - 1)):
+            targets.add(rng.choice(ends) if len(ends) else rng.randint(1, i - 1))
+        for t in targets:
+            links.append((t, i, rng.randint(1, max_cost)))
+            ends += [t, i]
+    return links
+
+
+TOPOLOGIES = {
+    'ring': ring_topology,
+    'grid': grid_topology,
+    'geometric': geometric_topology,
+    'scale-free': scale_free_topology,
+}
+
+
+def event_trace(links, count, rng, max_cost, start=5, gap=5):
+    '''
+    Returns an event trace over existing links: every event either changes a link's cost or takes it down, and a link
+    that was taken down comes back up at a later event.
+    :param links: [(int, int, int)...]
+    :param count: int - number of events
+    :param rng: random.Random
+    :param max_cost: int
+    :param start: int - time of the first event
+    :param gap: int - rounds between events
+    :return: [(int, int, int, int)...] - (time, router, router, cost), in time order
+    '''
+    events = []
+    down = []
+    t = start
+    for _ in range(count if len(links) else 0):
+        if (len(down) and rng.random() < 0.5):
+            n1, n2 = down.pop(rng.randrange(len(down)))
+            events.append((t, n1, n2, rng.randint(1, max_cost)))
+        else:
+            n1, n2 = rng.choice(links)[:2]
+            if (rng.random() < 0.3 and (n1, n2) not in down):
+                down.append((n1, n2))
+                events.append((t, n1, n2, -1))
+            else:
+                events.append((t, n1, n2, rng.randint(1, max_cost)))
+        t += gap
+    return events
+
+
+def write_case(directory, N, links, events):
+    '''
+    Writes a topology and events file in the format p3.py reads
+    :return: tuple - (topology file name, events file name)
+    '''
+    topology_file_name = os.path.join(directory, 'topology.txt')
+    events_file_name = os.path.join(directory, 'events.txt')
+    with open(topology_file_name, 'w') as f:
+        f.write(str(N) + '\n')
+        f.writelines(['%d %d %d\n' % link for link in links])
+    with open(events_file_name, 'w') as f:
+        f.writelines(['%d %d %d %d\n' % e for e in events])
+    return topology_file_name, events_file_name
+
+
+class _PhaseTimer(object):
+    '''
+    Mixed into a network class to time the phases of the simulation: sending vectors, updating vectors, formatting
+    output and everything else simulate does (applying events, checking for convergence and, for the async engine,
+    delivering messages). Time spent in a phase that is nested inside another one only counts towards the inner phase.
+    '''
+    def __init__(self, *args, **kwargs):
+        self.phase_times = {'send': 0.0, 'update': 0.0, 'output': 0.0, 'other': 0.0}
+        self._timer_stack = []
+        super(_PhaseTimer, self).__init__(*args, **kwargs)
+
+    def _timed(self, phase, method, *args):
+        start = default_timer()
+        self._timer_stack.append(0.0)
+        try:
+            return method(*args)
+        finally:
+            elapsed = default_timer() - start
+            self.phase_times[phase] += elapsed - self._timer_stack.pop()
+            if (len(self._timer_stack)):
+                self._timer_stack[-1] += elapsed
+
+    def simulate(self):
+        return self._timed('other', super(_PhaseTimer, self).simulate)
+
+    def _send(self, now, src, dst):
+        return self._timed('send', super(_PhaseTimer, self)._send, now, src, dst)
+
+    def _send_vectors(self):
+        return self._timed('send', super(_PhaseTimer, self)._send_vectors)
+
+    def _update_vectors(self, dirty):
+        return self._timed('update', super(_PhaseTimer, self)._update_vectors, dirty)
+
+    def _compute_round(self):
+        return self._timed('update', super(_PhaseTimer, self)._compute_round)
+
+    def _add_str(self, s):
+        return self._timed('output', super(_PhaseTimer, self)._add_str, s)
+
+    def _add_details(self, s):
+        return self._timed('output', super(_PhaseTimer, self)._add_details, s)
+
+    def get_output(self):
+        return self._timed('output', super(_PhaseTimer, self).get_output)
+
+
+def run_case(case):
+    '''
+    Generates and simulates a single benchmark case. Meant to be run in a fresh worker process, so that the peak
+    memory it reports belongs to this case alone.
+    :param case: dict - kind, size, events, engine, detailed, incremental, seed, max_cost
+    :return: [dict...] - one record per protocol
+    '''
+    if (case['engine'] == 'partitioned'):
+        raise ValueError('the partitioned engine can not run in benchmark worker processes')
+    rng = random.Random(case['seed'])
+    links = TOPOLOGIES[case['kind']](case['size'], rng, case['max_cost'])
+    events = event_trace(links, case['events'], rng, case['max_cost'])
+    directory = tempfile.mkdtemp(prefix='dv-benchmark-')
+    try:
+        topology_file_name, events_file_name = write_case(directory, case['size'], links, events)
+        network_class = engine_network_class(case['engine'])
+        network_class = type('Timed' + network_class.__name__, (_PhaseTimer, network_class), {})
+        options = {'incremental': True} if case['incremental'] else {}
+
+        start = default_timer()
+        networks = files_to_network(open(topology_file_name), open(events_file_name), case['detailed'],
+                                    network_class, network_options=options)
+        total = default_timer() - start
+    finally:
+        shutil.rmtree(directory)
+
+    records = []
+    for n in networks:
+        n.get_output()
+        seconds = sum(n.phase_times.values())
+        record = dict(case)
+        record.update({
+            'protocol': protocol_str[n.protocol],
+            'links': len(links),
+            'rounds': n.rounds,
+            'seconds': seconds,
+            'rounds_per_sec': n.rounds / seconds if seconds else None,
+            'convergence_delay': None if n.count_to_infinity_error else int(n.convergence_delay),
+            'count_to_infinity_error': n.count_to_infinity_error,
+            'phase_seconds': n.phase_times,
+            'case_seconds': total,
+            # ru_maxrss is in kilobytes on Linux
+            'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        })
+        records.append(record)
+    return records
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the distance vector simulator on synthetic topologies.')
+    parser.add_argument('--kinds', default='ring,grid,geometric,scale-free',
+                        help='comma separated topology kinds: ' + ', '.join(sorted(TOPOLOGIES)))
+    parser.add_argument('--sizes', default='25,50,100', help='comma separated numbers of routers')
+    parser.add_argument('--events', type=int, default=10, help='number of events per case')
+    parser.add_argument('--engines', default='object',
+                        help='comma separated engines: object, matrix, async (the partitioned engine starts worker '
+                             'processes of its own, which the benchmark\'s worker processes can not do)')
+    parser.add_argument('--max-cost', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--detailed', action='store_true', help='also produce the detailed output')
+    parser.add_argument('--incremental', action='store_true', help='use the incremental round mode')
+    parser.add_argument('--output', help='file to write the JSON lines to (default: stdout)')
+    args = parser.parse_args(argv)
+
+    cases = []
+    for kind in args.kinds.split(','):
+        for size in [int(x) for x in args.sizes.split(',')]:
+            for engine in args.engines.split(','):
+                cases.append({'kind': kind, 'size': size, 'events': args.events, 'engine': engine,
+                              'detailed': int(args.detailed), 'incremental': args.incremental, 'seed': args.seed,
+                              'max_cost': args.max_cost})
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    # A new process per case keeps the peak memory numbers apart
+    pool = Pool(1, maxtasksperchild=1)
+    try:
+        for records in pool.imap(run_case, cases):
+            for record in records:
+                out.write(json.dumps(record, sort_keys=True) + '\n')
+            out.flush()
+    finally:
+        pool.close()
+        pool.join()
+        if (out is not sys.stdout):
+            out.close()
+
+
+if (__name__ == "__main__"):
+    main(sys.argv[1:])
@@ -0,0 +1,276 @@
+'''
+Saves the state of a simulation between two rounds to a compact binary checkpoint, and restores it so the simulation
+can carry on (or a different future can be tried from it) without replaying the rounds before it.
+
+A checkpoint holds the round counter, the link costs, every router's distance vector, the events that have not
+happened yet and which routers changed in the last round. The vectors the routers last received from their neighbors
+are not stored: between two rounds they always match what the neighbors' current vectors advertise (see
+Network._set_vectors), so they are rebuilt from those. With detect_count_to_infinity, the rounds the detector has seen
+(see count_to_infinity.py) are stored after everything else, so a resumed network reports a count to infinity in the
+same round as the original one. Checkpoints work with both engines and can be restored into
+either one. The details of the rounds before a checkpoint are not part of it.
+
+Usage: python checkpoint.py <checkpoint> [--events <file>] [--engine object|matrix] [--incremental] [--details <file>]
+
+Resumes the simulation saved in the checkpoint, with the events of the events file (if any) added on top of the ones
+that were still waiting to happen, and prints the final output in the format of output.txt.
+'''
+import argparse
+from array import array
+import struct
+import sys
+import zlib
+
+from details_writer import open_details_writer
+from event import Event, file_to_events
+from hooks import NetworkHook
+from network import Network, write_output
+from topology import Topology
+
+CHECKPOINT_MAGIC = b'DVCKPT01'
+# magic, N, protocol, round, last round with events, flags, link slots, pending events, routers that changed last
+# round, destinations of those routers
+_CHECKPOINT_HEADER = struct.Struct('<8sqqqqqqqqq')
+_CONVERGED = 1
+_COUNT_TO_INFINITY_ERROR = 2
+_INT64 = 'l' if array('l').itemsize == 8 else 'q'
+
+
+def _array_bytes(a, typecode):
+    '''
+    Turns an array of integers into little endian integers of the size of typecode
+    :param a: array
+    :param typecode: str - 'i' or _INT64
+    :return: bytes
+    '''
+    if (a.typecode != typecode or sys.byteorder == 'big'):
+        a = array(typecode, a)
+        if (sys.byteorder == 'big'):
+            a.byteswap()
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
+def _bytes_array(data, typecode):
+    '''
+    Turns little endian integers of the size of typecode back into an array
+    :param data: bytes
+    :param typecode: str - 'i' or _INT64
+    :return: array
+    '''
+    a = array(typecode)
+    if (hasattr(a, 'frombytes')):
+        a.frombytes(data)
+    else:
+        a.fromstring(data)
+    if (sys.byteorder == 'big'):
+        a.byteswap()
+    return a
+
+
+def _detector_array(network):
+    '''
+    Flattens the state of the count to infinity detector of a network: the number of histories, then for each one the
+    first router of its component, the destination, the number of states and of routes in a state, and every state as
+    lowest cost, lowest hops and (next hop, cost, hops) per route (-1, -1, -1 for a route that is not there). After
+    that the number of destinations in count_to_infinity_routes, and for each one the destination, the number of
+    routers and the routers.
+    :param network: Network
+    :return: array of 64 bit integers, empty if the network has no detector
+    '''
+    a = array(_INT64)
+    if (network._detector is None):
+        return a
+    history = network._detector._history
+    a.append(len(history))
+    for key in sorted(history):
+        states = history[key]
+        a.extend((key[0], key[1], len(states), len(states[0][0])))
+        for state, min_cost, min_hops in states:
+            a.extend((min_cost, min_hops))
+            for route in state:
+                a.extend((-1, -1, -1) if route is None else route)
+    routes = network.count_to_infinity_routes
+    a.append(len(routes))
+    for d in sorted(routes):
+        a.extend((d, len(routes[d])))
+        a.extend(routes[d])
+    return a
+
+
+def _restore_detector(network, a):
+    '''
+    Restores the state of the count to infinity detector of a network from _detector_array
+    :param network: Network
+    :param a: array
+    :return: None
+    '''
+    values = iter(a.tolist())
+    history = {}
+    for _ in range(next(values)):
+        first, d, num_states, num_routes = [next(values) for _ in range(4)]
+        states = []
+        for _ in range(num_states):
+            min_cost, min_hops = next(values), next(values)
+            state = []
+            for _ in range(num_routes):
+                route = (next(values), next(values), next(values))
+                state.append(None if route[0] == -1 else route)
+            states.append((tuple(state), min_cost, min_hops))
+        history[(first, d)] = states
+    routes = {}
+    for _ in range(next(values)):
+        d, num_routers = next(values), next(values)
+        routes[d] = [next(values) for _ in range(num_routers)]
+    network._detector._history = history
+    network.count_to_infinity_routes = routes
+
+
+def save_checkpoint(network, file_name, include_events=True):
+    '''
+    Saves the state of network to a checkpoint. Must be called between two rounds: before or after simulate(), or
+    from a hook's round_end (see CheckpointHook).
+    :param network: Network
+    :param file_name: str
+    :param include_events: boolean - whether to save the events that have not happened yet
+    :return: None
+    '''
+    t = network.topology
+    events = array('i')
+    for e in (network._events.pending() if include_events else ()):
+        events.extend((e.time, e.link[0], e.link[1], e.cost))
+    changed_routers, changed_counts, changed_destinations = array('i'), array('i'), array('i')
+    for i in sorted(network._changed):
+        changed_routers.append(i)
+        if (network._changed[i] is None):
+            changed_counts.append(-1)
+        else:
+            changed_counts.append(len(network._changed[i]))
+            changed_destinations.extend(sorted(network._changed[i]))
+    cost, next_hop, hops = network._get_vectors()
+    flags = (_CONVERGED if network._converged else 0) | \
+            (_COUNT_TO_INFINITY_ERROR if network.count_to_infinity_error else 0)
+
+    with open(file_name, 'wb') as f:
+        f.write(_CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, network.N, network.protocol, network.round,
+                                        network._last_event_time, flags, len(t.indices), len(events) // 4,
+                                        len(changed_routers), len(changed_destinations)))
+        compressor = zlib.compressobj()
+        for a, typecode in ((t.indptr, _INT64), (t.indices, _INT64), (t.costs, _INT64), (cost, _INT64),
+                            (next_hop, 'i'), (hops, 'i'), (events, 'i'), (changed_routers, 'i'),
+                            (changed_counts, 'i'), (changed_destinations, 'i'), (_detector_array(network), _INT64)):
+            f.write(compressor.compress(_array_bytes(a, typecode)))
+        f.write(compressor.flush())
+
+
+def load_checkpoint(file_name, network_class=Network, detailed=False, **network_options):
+    '''
+    Restores a network from a checkpoint. Calling simulate() on it carries on from the round after the checkpoint and
+    gives exactly the output the original simulation would have given. More events can be added first to see what
+    would happen instead.
+    :param file_name: str
+    :param network_class: Network or a subclass of it (e.g. MatrixNetwork)
+    :param detailed: boolean
+    :param network_options: extra keyword arguments for network_class (e.g. incremental)
+    :return: Network
+    '''
+    with open(file_name, 'rb') as f:
+        header = f.read(_CHECKPOINT_HEADER.size)
+        if (len(header) != _CHECKPOINT_HEADER.size or header[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC):
+            raise ValueError(file_name + ' is not a checkpoint')
+        body = zlib.decompress(f.read())
+    (magic, N, protocol, t, last_event_time, flags, slots, num_events, num_changed,
+     num_destinations) = _CHECKPOINT_HEADER.unpack(header)
+
+    arrays = []
+    start = 0
+    for length, typecode in ((N + 2, _INT64), (slots, _INT64), (slots, _INT64), (N * N, _INT64), (N * N, 'i'),
+                             (N * N, 'i'), (4 * num_events, 'i'), (num_changed, 'i'), (num_changed, 'i'),
+                             (num_destinations, 'i')):
+        size = length * array(typecode).itemsize
+        arrays.append(_bytes_array(body[start:start + size], typecode))
+        start += size
+    # Whatever is left is the state of the count to infinity detector, if the network had one
+    detector = _bytes_array(body[start:], _INT64)
+    (indptr, indices, costs, cost, next_hop, hops, events, changed_routers, changed_counts,
+     changed_destinations) = arrays
+
+    topology = Topology.__new__(Topology)
+    topology.N = N
+    topology.indptr, topology.indices, topology.costs = [array('l', a) for a in (indptr, indices, costs)]
+    network = network_class(topology, protocol, detailed, **network_options)
+    network._set_vectors(cost, next_hop, hops)
+    network.round = t
+    network._last_event_time = last_event_time
+    network._converged = bool(flags & _CONVERGED)
+    network.count_to_infinity_error = bool(flags & _COUNT_TO_INFINITY_ERROR)
+
+    network._changed = {}
+    start = 0
+    for i, count in zip(changed_routers, changed_counts):
+        if (count == -1):
+            network._changed[i] = None
+        else:
+            network._changed[i] = set(changed_destinations[start:start + count])
+            start += count
+    network.add_events([Event(events[i:i + 4].tolist()) for i in range(0, len(events), 4)])
+
+    if (network._detector is not None):
+        if (len(detector)):
+            _restore_detector(network, detector)
+        elif (t > last_event_time and not network._converged and network._no_events_within_budget()):
+            # The detector would be looking at the rounds before the checkpoint, which were not saved
+            raise ValueError(file_name + ' was saved without detect_count_to_infinity and can not be resumed with it')
+    return network
+
+
+class CheckpointHook(NetworkHook):
+    '''
+    Saves a checkpoint of every network it is added to at the end of the chosen rounds, and optionally at the end of
+    the simulation. The file name is formatted with the protocol number and the round, e.g.
+    "run-{protocol}-{round}.ckpt".
+    '''
+    def __init__(self, file_name, rounds=(), final=False):
+        '''
+        :param file_name: str - format string with {protocol} and {round} fields
+        :param rounds: iterable of int - the rounds to save a checkpoint after
+        :param final: boolean - also save one after the last round
+        '''
+        self.file_name = file_name
+        self.rounds = set(rounds)
+        self.final = final
+
+    def round_end(self, network, t, stats):
+        finished = network.count_to_infinity_error or (network._converged and len(network._events) == 0)
+        if (t in self.rounds or (self.final and finished)):
+            save_checkpoint(network, self.file_name.format(protocol=network.protocol, round=t))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Resume a distance vector simulation from a checkpoint.')
+    parser.add_argument('checkpoint', help='checkpoint file to resume from')
+    parser.add_argument('--events', help='events file with more events to add')
+    parser.add_argument('--engine', choices=['object', 'matrix'], default='object')
+    parser.add_argument('--incremental', action='store_true', help='use the incremental round mode')
+    parser.add_argument('--details', help='file to write the detailed output of the resumed rounds to')
+    args = parser.parse_args(argv)
+
+    network_class = Network
+    if (args.engine == 'matrix'):
+        from matrix_network import MatrixNetwork
+        network_class = MatrixNetwork
+    details = open_details_writer(args.details) if args.details else None
+    try:
+        network = load_checkpoint(args.checkpoint, network_class, details is not None, incremental=args.incremental,
+                                  details_sink=details)
+        if (args.events):
+            with open(args.events) as f:
+                network.add_events(file_to_events(f))
+        network.simulate()
+    finally:
+        if (details is not None):
+            details.close()
+    write_output(sys.stdout, [network])
+
+
+if (__name__ == "__main__"):
+    main(sys.argv[1:])
@@ -0,0 +1,27 @@
+from __future__ import print_function
+import sys
+
+from event import iter_events, write_binary_events
+from topology import file_to_topology, write_binary_topology
+
+def usage():
+    print("Usage: ./convert.py <topology|events> <text filename> <binary filename>")
+    sys.exit(0)
+
+def main(argv):
+    '''
+    Converts a topology or events file from the text format to the binary format. The simulator reads both formats,
+    binary files just load much faster.
+    '''
+    if (len(argv) != 3 or argv[0] not in ('topology', 'events')):
+        usage()
+
+    kind, text_file_name, binary_file_name = argv
+    with open(text_file_name) as f:
+        if (kind == 'topology'):
+            write_binary_topology(file_to_topology(f), binary_file_name)
+        else:
+            write_binary_events(iter_events(f), binary_file_name)
+
+if (__name__ == "__main__"):
+    main(sys.argv[1:])
@@ -0,0 +1,62 @@
+class CountToInfinityDetector(object):
+    '''
+    Spots a network that is counting to infinity while it simulates, instead of waiting out the round budget.
+
+    Counting to infinity only happens for a destination that can not be reached: a destination that can be reached is
+    always converged to in the end, however long the bogus routes take to get more expensive than the real one. So for
+    every connected component and every destination outside of it that some router in the component still has a route
+    to, the detector keeps the last few states of those routes (next hop, cost and hops of every router in the
+    component) with the lowest cost and hop count taken off.
+
+    Those routes only depend on each other, and adding the same amount to all of their costs (or hops) just adds it
+    to every later state as well. So when such a state comes back, only shifted, or comes back after changing in
+    between, the routes go round the same way forever and the network will never converge. A state that repeats
+    without any change is just converged and is not reported.
+    '''
+    # Number of past rounds kept for each destination
+    HISTORY = 8
+
+    def __init__(self):
+        self._components = None
+        self._history = {}
+
+    def reset(self):
+        '''
+        Forgets everything seen so far. Must be called whenever the links of the network change.
+        :return: None
+        '''
+        self._components = None
+        self._history = {}
+
+    def check(self, network):
+        '''
+        Looks at the routes to unreachable destinations after a round.
+        :param network: Network
+        :return: {int: [int...]} - for each destination that is being counted to infinity, the routers with a route
+        to it. Empty if there are none.
+        '''
+        if (self._components is None):
+            self._components = [(members, set(members)) for members in network.topology.components()]
+        history = {}
+        found = {}
+        for members, member_set in self._components:
+            if (len(members) == network.N):
+                continue
+            for d in range(1, network.N + 1):
+                if (d in member_set):
+                    continue
+                entries = network._get_entries(members, d)
+                finite = [e for e in entries if e[0] != -1]
+                if (not len(finite)):
+                    continue
+                min_cost = min(e[0] for e in finite)
+                min_hops = min(e[2] for e in finite)
+                state = tuple(None if e[0] == -1 else (e[1], e[0] - min_cost, e[2] - min_hops) for e in entries)
+                key = (members[0], d)
+                past = self._history.get(key, [])
+                if (len(past) and past[-1] != (state, min_cost, min_hops) and
+                        any(state == past_state for past_state, _, _ in past)):
+                    found.setdefault(d, []).extend(members[i] for i, e in enumerate(entries) if e[0] != -1)
+                history[key] = (past + [(state, min_cost, min_hops)])[-self.HISTORY:]
+        self._history = history
+        return dict((d, sorted(routers)) for d, routers in found.items())
@@ -0,0 +1,69 @@
+import gzip
+import sys
+
+
+class DetailsWriter(object):
+    '''
+    A file-like sink that the detailed output of a Network is streamed into while it simulates. Writes are collected
+    in a buffer and handed to the underlying file in chunks of about buffer_size characters, so many small writes
+    (one per router per round) stay cheap even when the underlying file is gzip compressed.
+    '''
+    def __init__(self, raw, buffer_size=1 << 16):
+        '''
+        :param raw: file-like object with write() and close()
+        :param buffer_size: int
+        '''
+        self._raw = raw
+        self._buffer = []
+        self._buffered = 0
+        self._buffer_size = buffer_size
+
+    def write(self, s):
+        '''
+        Writes s to the sink
+        :param s: str
+        :return: None
+        '''
+        self._buffer.append(s)
+        self._buffered += len(s)
+        if (self._buffered >= self._buffer_size):
+            self.flush()
+
+    def flush(self):
+        '''
+        Hands everything buffered to the underlying file
+        :return: None
+        '''
+        if (len(self._buffer)):
+            self._raw.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        self._raw.flush()
+
+    def close(self):
+        '''
+        Flushes and closes the underlying file
+        :return: None
+        '''
+        self.flush()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_details_writer(file_name, buffer_size=1 << 16):
+    '''
+    Opens a DetailsWriter on the given file. File names ending in .gz are gzip compressed, anything else is written as
+    plain text.
+    :param file_name: str
+    :param buffer_size: int
+    :return: DetailsWriter
+    '''
+    if (file_name.endswith('.gz')):
+        # Text mode on Python 3, where gzip files are binary by default
+        return DetailsWriter(gzip.open(file_name, 'wb' if sys.version_info[0] < 3 else 'wt'), buffer_size)
+    return DetailsWriter(open(file_name, 'w'), buffer_size)
@@ -1,3 +1,17 @@
+from array import array
+from heapq import heappush, heappop
+import mmap
+import os
+import struct
+import sys
+
+# Binary event files: a header (magic, number of events) followed by every event as four little endian 32 bit integers:
+# time, router, router, cost.
+BINARY_EVENTS_MAGIC = b'DVEVNT01'
+_BINARY_EVENTS_HEADER = struct.Struct('<8sq')
+# Events read from the memory mapped file at a time
+_BINARY_EVENTS_CHUNK = 4096
+
 class Event:
     '''
     This class represents and event that can occur. It has three properties,
@@ -16,14 +30,180 @@ class Event:
     def __lt__(self, other):
         return self.time < other.time
 
+class EventQueue(object):
+    '''
+    A heap of events ordered by time. Events that share a time come out in the order they were added. Events can be
+    added at any point, including while a simulation is running, either all at once or as a lazy stream that is only
+    read as far as the simulation has got.
+    '''
+    def __init__(self):
+        # Entries are (time, order added, event, stream the event came from or None)
+        self._heap = []
+        self._count = 0
+
+    def _push(self, event, stream):
+        heappush(self._heap, (event.time, self._count, event, stream))
+        self._count += 1
+
+    def add_events(self, events):
+        '''
+        Adds all the given events to the queue right away
+        :param events: [Event...]
+        :return: None
+        '''
+        for e in events:
+            self._push(e, None)
+
+    def add_stream(self, events):
+        '''
+        Adds a stream of events, which must be in time order. Only the next event of the stream is kept in the queue,
+        the one after it is read when that event is taken out.
+        :param events: iterator of Event
+        :return: None
+        '''
+        for e in events:
+            self._push(e, events)
+            break
+
+    def peek_time(self):
+        '''
+        Returns the time of the next event, or None if there are no more events
+        :return: int
+        '''
+        return self._heap[0][0] if len(self._heap) else None
+
+    def pop_due(self, t):
+        '''
+        Takes every event that is due by time t out of the queue
+        :param t: int
+        :return: [Event...] - in the order they should be applied
+        '''
+        due = []
+        while (len(self._heap) and self._heap[0][0] <= t):
+            event, stream = heappop(self._heap)[2:]
+            if (stream is not None):
+                self.add_stream(stream)
+            due.append(event)
+        return due
+
+    def pending(self):
+        '''
+        Returns every event still in the queue, in the order they will be applied. Streams are read to the end to do
+        so, their remaining events are kept in the queue from then on.
+        :return: [Event...]
+        '''
+        events = []
+        while (len(self._heap)):
+            event, stream = heappop(self._heap)[2:]
+            if (stream is not None):
+                self.add_stream(stream)
+            events.append(event)
+        self.add_events(events)
+        return events
+
+    def __len__(self):
+        return len(self._heap)
+
+def iter_events(file):
+    '''
+    Given an events file, this will lazily yield an Event for every line, reading the file as it goes. Binary event
+    files are recognized and read as well.
+    :param file: file
+    :return: iterator of Event
+    '''
+    if (hasattr(file, 'name') and is_binary_events(file.name)):
+        for e in iter_binary_events(file.name):
+            yield e
+        return
+    for line in file:
+        values = [int(i) for i in line.split()]
+        if (len(values)):
+            yield Event(values)
+
 def file_to_events(file):
     '''
     Given an events file, this will return an array of Event objects.
     :param file:
     :return:
     '''
-    lines = file.read().splitlines()
-    events = []
-    for line in lines:
-        events.append(Event([int(i) for i in line.split(" ")]))
-    return events
+    return list(iter_events(file))
+
+class EventFile(object):
+    '''
+    Stands for the events of an events file without reading them. Every iteration opens the file again and streams
+    the events from it, so the same EventFile can be replayed for each protocol (or sent to a worker process). The
+    events in the file must be in time order.
+    '''
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    def __iter__(self):
+        with open(self.file_name) as f:
+            for e in iter_events(f):
+                yield e
+
+def is_binary_events(file_name):
+    '''
+    Indicates whether the file is a binary events file
+    :param file_name: str
+    :return: boolean
+    '''
+    if (not os.path.isfile(file_name)):
+        return False
+    with open(file_name, 'rb') as f:
+        return f.read(len(BINARY_EVENTS_MAGIC)) == BINARY_EVENTS_MAGIC
+
+def write_binary_events(events, file_name):
+    '''
+    Writes events to a binary events file. The events are written as they come, so events can be a lazy stream.
+    :param events: iterable of Event
+    :param file_name: str
+    :return: None
+    '''
+    with open(file_name, 'wb') as f:
+        f.write(_BINARY_EVENTS_HEADER.pack(BINARY_EVENTS_MAGIC, 0))
+        count = 0
+        chunk = array('i')
+        for e in events:
+            chunk.extend((e.time, e.link[0], e.link[1], e.cost))
+            count += 1
+            if (len(chunk) >= 4 * _BINARY_EVENTS_CHUNK):
+                _write_int32s(f, chunk)
+                chunk = array('i')
+        _write_int32s(f, chunk)
+        f.seek(0)
+        f.write(_BINARY_EVENTS_HEADER.pack(BINARY_EVENTS_MAGIC, count))
+
+def _write_int32s(f, a):
+    if (sys.byteorder == 'big'):
+        a.byteswap()
+    f.write(a.tobytes() if hasattr(a, 'tobytes') else a.tostring())
+
+def iter_binary_events(file_name):
+    '''
+    Lazily yields the events of a binary events file. The file is memory mapped and read a chunk of events at a time,
+    straight into an array.
+    :param file_name: str
+    :return: iterator of Event
+    '''
+    with open(file_name, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, count = _BINARY_EVENTS_HEADER.unpack_from(mm, 0)
+            if (magic != BINARY_EVENTS_MAGIC):
+                raise ValueError(file_name + ' is not a binary events file')
+            start = _BINARY_EVENTS_HEADER.size
+            for first in range(0, count, _BINARY_EVENTS_CHUNK):
+                n = min(_BINARY_EVENTS_CHUNK, count - first)
+                chunk = array('i')
+                data = mm[start + 16 * first:start + 16 * (first + n)]
+                if (hasattr(chunk, 'frombytes')):
+                    chunk.frombytes(data)
+                else:
+                    chunk.fromstring(data)
+                if (sys.byteorder == 'big'):
+                    chunk.byteswap()
+                for i in range(0, 4 * n, 4):
+                    yield Event(chunk[i:i + 4].tolist())
+        finally:
+            mm.close()
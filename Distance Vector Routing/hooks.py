@@ -0,0 +1,84 @@
+from network import protocol_str
+
+
+class NetworkHook(object):
+    '''
+    Base class for hooks that can be added to a Network (Network.add_hook or the hooks argument) to follow a
+    simulation. Every callback does nothing by default, subclasses override the ones they care about. A network
+    without hooks skips all of this.
+    '''
+    def round_start(self, network, t):
+        '''
+        Called at the start of round t, before the events of the round are applied.
+        :param network: Network
+        :param t: int
+        :return: None
+        '''
+        pass
+
+    def event_applied(self, network, t, event):
+        '''
+        Called after an event was applied in round t.
+        :param network: Network
+        :param t: int
+        :param event: Event
+        :return: None
+        '''
+        pass
+
+    def router_changed(self, network, t, router_num, destinations):
+        '''
+        Called when the distance vector of a router changed in round t.
+        :param network: Network
+        :param t: int
+        :param router_num: int
+        :param destinations: [int...] - the destinations whose entry changed
+        :return: None
+        '''
+        pass
+
+    def round_end(self, network, t, stats):
+        '''
+        Called at the end of round t.
+        :param network: Network
+        :param t: int
+        :param stats: dict - round, events, vectors_sent, entries_recomputed, routers_changed and seconds
+        :return: None
+        '''
+        pass
+
+
+class TimelineCollector(NetworkHook):
+    '''
+    Writes one row per round of every network it is added to: protocol, round, events applied, vectors sent, entries
+    recomputed, routers changed and the time the round took. The rows are written as CSV, or as JSON lines if the file
+    name ends in .json or .jsonl.
+    '''
+    FIELDS = ['protocol', 'round', 'events', 'vectors_sent', 'entries_recomputed', 'routers_changed', 'seconds']
+
+    def __init__(self, file_name):
+        self._file = open(file_name, 'w')
+        self._json = file_name.endswith('.json') or file_name.endswith('.jsonl')
+        self._csv = None
+        # csv and json are only imported by the collectors that write them
+        if (self._json):
+            import json
+            self._dumps = json.dumps
+        else:
+            import csv
+            self._csv = csv.DictWriter(self._file, self.FIELDS)
+            self._csv.writerow(dict((f, f) for f in self.FIELDS))
+
+    def round_end(self, network, t, stats):
+        row = dict(stats, protocol=protocol_str[network.protocol])
+        if (self._json):
+            self._file.write(self._dumps(row, sort_keys=True) + '\n')
+        else:
+            self._csv.writerow(row)
+
+    def close(self):
+        '''
+        Closes the timeline file
+        :return: None
+        '''
+        self._file.close()
@@ -0,0 +1,227 @@
+from array import array
+
+import numpy as np
+
+from network import Network
+from output_format import format_row
+from routing_table import BASIC_PROTOCOL
+
+# Stand-in for an unreachable destination while taking minimums. Large enough to never be a real path cost, small
+# enough that adding a link cost to it can not overflow.
+INF = np.iinfo(np.int64).max // 4
+
+# Upper bound on the number of elements in a temporary (rows x N) array used during a round.
+BLOCK_ELEMENTS = 1 << 22
+
+
+class MatrixNetwork(Network):
+    '''
+    Drop in replacement for Network that keeps the state of every router in dense N x N numpy arrays (cost, next hop
+    and hop count, indexed by [router - 1, destination - 1]) instead of Router/RoutingTable objects. Each round of the
+    distance vector algorithm is done as one vectorized min-plus step over all routers at once. Produces the same
+    output, details and convergence delay as Network for all three protocols.
+    '''
+    def _build_routers(self):
+        '''
+        Builds the cost, next hop and hop count arrays. A value of -1 means "unreachable", just like in VectorEntry.
+        Links are read straight from the compressed sparse rows of self.topology.
+        :return: None
+        '''
+        N = self.N
+        self._cost = np.full((N, N), -1, dtype=np.int64)
+        self._next_hop = np.full((N, N), -1, dtype=np.int64)
+        self._hops = np.full((N, N), -1, dtype=np.int64)
+        diagonal = np.arange(N)
+        self._cost[diagonal, diagonal] = 0
+        self._next_hop[diagonal, diagonal] = diagonal + 1
+        self._hops[diagonal, diagonal] = 0
+
+        for i in range(1, N + 1):
+            self.routers[i] = _RouterView(self, i)
+
+    def _enact_event(self, event):
+        '''
+        Makes the event happen. Sets the cost of the edge between the two routers. Just like RoutingTable.set_neighbor,
+        a brand new link resets what both ends know about reaching each other.
+        :param event: Event
+        :return: None
+        '''
+        n1, n2 = event.link
+        if (n1 != n2 and event.cost != -1 and self.topology.get_cost(n1, n2) == -1):
+            for src, dst in ((n1 - 1, n2 - 1), (n2 - 1, n1 - 1)):
+                self._cost[src, dst] = -1
+                self._next_hop[src, dst] = -1
+                self._hops[src, dst] = -1
+        self.topology.set_cost(n1, n2, event.cost)
+        self._forget_rows((n1, n2))
+
+    def _get_vectors(self):
+        '''
+        Returns the cost, next hop and hop count arrays flattened into arrays, in the layout of Network._get_vectors.
+        :return: tuple - (cost, next hop, hops) as array('l'), array('i'), array('i')
+        '''
+        return tuple(array(typecode, a.astype(np.dtype(typecode)).tobytes())
+                     for a, typecode in ((self._cost, 'l'), (self._next_hop, 'i'), (self._hops, 'i')))
+
+    def _set_vectors(self, cost, next_hop, hops):
+        '''
+        Replaces the cost, next hop and hop count arrays, given in the layout of Network._get_vectors.
+        :param cost: array
+        :param next_hop: array
+        :param hops: array
+        :return: None
+        '''
+        self._cost, self._next_hop, self._hops = [np.frombuffer(a, dtype=np.dtype(a.typecode)).astype(np.int64)
+                                                  .reshape(self.N, self.N) for a in (cost, next_hop, hops)]
+        self._forget_rows()
+
+    def _get_entries(self, routers, destination):
+        '''
+        Returns the entry of each of the routers for one destination, like Network._get_entries
+        :param routers: [int...]
+        :param destination: int
+        :return: [(int, int, int)...] - (cost, next hop, hops) for each router
+        '''
+        rows = np.array(routers, dtype=np.int64) - 1
+        return list(zip(self._cost[rows, destination - 1].tolist(), self._next_hop[rows, destination - 1].tolist(),
+                        self._hops[rows, destination - 1].tolist()))
+
+    def _csr_arrays(self):
+        '''
+        Returns numpy copies of the topology's compressed sparse rows, shifted so that row i belongs to router i + 1 and
+        neighbors are 0 based.
+        :return: tuple - (row start, degree, neighbor, link cost) arrays
+        '''
+        t = self.topology
+        indptr = np.frombuffer(t.indptr, dtype=np.dtype(t.indptr.typecode)).astype(np.int64)
+        indices = np.frombuffer(t.indices, dtype=np.dtype(t.indices.typecode)).astype(np.int64) - 1
+        costs = np.frombuffer(t.costs, dtype=np.dtype(t.costs.typecode)).astype(np.int64)
+        return indptr[1:-1], np.diff(indptr[1:]), indices, costs
+
+    def _compute_round(self):
+        '''
+        Computes the distance vectors every router would have after receiving the current vectors of its neighbors.
+        :return: tuple - (cost, next_hop, hops) arrays
+        '''
+        cost = np.empty_like(self._cost)
+        next_hop = np.empty_like(self._next_hop)
+        hops = np.empty_like(self._hops)
+        self._compute_rows(0, self.N, cost, next_hop, hops)
+        return cost, next_hop, hops
+
+    def _compute_rows(self, first, last, cost, next_hop, hops):
+        '''
+        Computes the new distance vectors of the routers in rows first to last - 1 (routers first + 1 to last) and writes
+        them into the same rows of cost, next_hop and hops. Works through the rows in blocks to bound the size of the
+        temporaries.
+        :param first: int
+        :param last: int
+        :param cost: N x N array
+        :param next_hop: N x N array
+        :param hops: N x N array
+        :return: None
+        '''
+        N = self.N
+        row_start, degree, indices, link_costs = self._csr_arrays()
+        max_degree = int(degree[first:last].max()) if last > first else 0
+        block = max(1, BLOCK_ELEMENTS // max(N, 1))
+
+        for start in range(first, last, block):
+            stop = min(last, start + block)
+            rows = np.arange(start, stop)
+            best = np.full((stop - start, N), INF, dtype=np.int64)
+            best_hop = np.full((stop - start, N), -1, dtype=np.int64)
+            best_hops = np.full((stop - start, N), -1, dtype=np.int64)
+
+            # Neighbors are visited in ascending order and only a strictly better cost replaces the current best,
+            # which breaks ties towards the lowest router number like RoutingTable.update_distance_vector does.
+            for k in range(max_degree):
+                valid = degree[start:stop] > k
+                position = np.where(valid, row_start[start:stop] + k, 0)
+                u = np.where(valid, indices[position], 0)
+                link = link_costs[position]
+                valid &= link != -1
+                advertised = self._cost[u]
+                usable = (advertised != -1) & valid[:, None]
+                if (self.protocol != BASIC_PROTOCOL):
+                    # Split horizon (with or without poison) hides the routes that go through the receiver
+                    usable &= self._next_hop[u] != (rows + 1)[:, None]
+                candidate = np.where(usable, link[:, None] + advertised, INF)
+                better = candidate < best
+                best = np.where(better, candidate, best)
+                best_hop = np.where(better, (u + 1)[:, None], best_hop)
+                best_hops = np.where(better, self._hops[u] + 1, best_hops)
+
+            unreachable = best == INF
+            best[unreachable] = -1
+            best_hop[unreachable] = -1
+            best_hops[unreachable] = -1
+            best[rows - start, rows] = 0
+            best_hop[rows - start, rows] = rows + 1
+            best_hops[rows - start, rows] = 0
+            cost[start:stop] = best
+            next_hop[start:stop] = best_hop
+            hops[start:stop] = best_hops
+
+    def _run_round(self):
+        '''
+        Runs a single round of the distance vector algorithm for the whole network. In detailed mode the routers are
+        swapped over to their new vectors one at a time so the details match Network's exactly.
+        :return: boolean - whether or not any router's distance vector changed
+        '''
+        cost, next_hop, hops = self._compute_round()
+        differs = (cost != self._cost) | (next_hop != self._next_hop) | (hops != self._hops)
+        return self._finish_round(cost, next_hop, hops, np.nonzero(differs.any(axis=1))[0])
+
+    def _finish_round(self, cost, next_hop, hops, changed_rows):
+        '''
+        Moves the routers over to the vectors computed for this round and does the bookkeeping and details of the round.
+        :param cost: N x N array
+        :param next_hop: N x N array
+        :param hops: N x N array
+        :param changed_rows: array of the rows whose vector changed
+        :return: boolean - whether or not any router's distance vector changed
+        '''
+        self._changed = dict((int(row) + 1, None) for row in changed_rows)
+        self._vectors_sent += int((self._csr_arrays()[3] != -1).sum())
+        self._entries_recomputed += self.N * (self.N - 1)
+        for hook in self._hooks:
+            for row in changed_rows:
+                differs = (cost[row] != self._cost[row]) | (next_hop[row] != self._next_hop[row]) | \
+                          (hops[row] != self._hops[row])
+                hook.router_changed(self, self.round, int(row) + 1, (np.nonzero(differs)[0] + 1).tolist())
+
+        if (self.detailed):
+            for i in self.routers:
+                self._add_str('\tRouter ' + str(i) + ":")
+                self._add_details("")
+                self._add_str("\n")
+                self._cost[i - 1] = cost[i - 1]
+                self._next_hop[i - 1] = next_hop[i - 1]
+                self._hops[i - 1] = hops[i - 1]
+                if (i in self._changed):
+                    self._forget_rows((i,))
+        else:
+            self._cost, self._next_hop, self._hops = cost, next_hop, hops
+            self._forget_rows(self._changed)
+        return len(changed_rows) > 0
+
+
+class _RouterView(object):
+    '''
+    Stands in for a Router inside MatrixNetwork.routers so that the output methods of Network work unchanged.
+    '''
+    def __init__(self, network, router_num):
+        self._network = network
+        self._router_num = router_num
+
+    def get_router_num(self):
+        '''
+        Returns the router num for this router
+        :return: int
+        '''
+        return self._router_num
+
+    def __str__(self):
+        row = self._router_num - 1
+        return format_row(self._router_num, self._network._next_hop[row].tolist(), self._network._hops[row].tolist())
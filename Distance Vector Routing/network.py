@@ -1,37 +1,176 @@
 from router import Router
-from event import file_to_events
-from copy import deepcopy
-from collections import defaultdict
+from routing_table import VectorEntry
+from count_to_infinity import CountToInfinityDetector
+from event import file_to_events, EventQueue, EventFile
+from topology import file_to_topology
+from details_writer import open_details_writer
+from output_format import format_header, format_summary, format_tables
+from shortest_paths import check_routes, warm_start_network
+from timeit import default_timer
+from array import array
+import os
 
 protocol_str = ['Basic Distance Vector Routing', 'Split Horizon', 'Split Horizon with Poison']
 
+# Short names of the protocols, as used by batch manifests and simulation.simulate
+PROTOCOL_NAMES = {'basic': 0, 'split-horizon': 1, 'poison-reverse': 2}
+
+# Frame around the details of each protocol in detailed-output.txt
+DETAILS_HEADER = "\n-----------------------------------------------------------\n"
+DETAILS_FOOTER = '\n \n \n \n'
+
 class Network(object):
-    def __init__(self, N, real_routing_values, protocol, detailed=True):
-        # real_routing_values only contains neighbors/real edges in the system.
-        self.N              = N
+    # Whether the state of the network can be saved to a checkpoint (see checkpoint.py)
+    supports_checkpoints = True
+
+    def __init__(self, topology, protocol, detailed=True, incremental=False, details_sink=None, hooks=None,
+                 round_budget=100, detect_count_to_infinity=False, output_format='text', details_every=1,
+                 details_changed_only=False, warm_start=False, validate=False):
+        # topology only contains neighbors/real edges in the system.
+        # In incremental mode a router only recalculates the destinations that changed in the vectors it received.
+        # If details_sink (a file-like object, e.g. a DetailsWriter) is given, the details are streamed into it as the
+        # simulation goes instead of being kept in memory.
+        # hooks are NetworkHook objects that get called back as the simulation goes (see hooks.py).
+        # A count to infinity error is reported once round_budget rounds go by without an event and without
+        # converging. With detect_count_to_infinity it is reported as soon as it is certain to happen instead (see
+        # count_to_infinity.py), and count_to_infinity_routes tells which destinations and routers are involved.
+        # output_format is the format of get_output() and the details (see output_format.py). The details can be
+        # limited to every details_every-th round, and with details_changed_only to the rounds where a vector changed.
+        # In the structured formats the details are the routing tables at the end of each of those rounds.
+        # With warm_start the rounds before the first event are skipped when the network would have converged by then,
+        # starting from the shortest paths instead (see shortest_paths.py). With validate the final routing tables are
+        # checked against the shortest paths, and route_errors lists the routes that differ.
+        self.N              = topology.N
         self.detailed = detailed
-        self.real_routing_values  = real_routing_values
-        self._events        = []
+        self.topology = topology
+        self._events        = EventQueue()
         self.routers        = {}
-        self.details = ''
+        self._details = []
+        self._details_sink = details_sink
+        self.output_format = output_format
+        self.details_every = details_every
+        self.details_changed_only = details_changed_only
+        # Details of the current round while it is not known yet whether they will be kept, and whether they are
+        # being left out
+        self._held_details = None
+        self._skip_details = output_format != 'text'
+        # router -> its routing table in the text layout, for the routers that did not change since it was formatted
+        self._formatted_rows = {}
         self.count_to_infinity_error = False
+        self.count_to_infinity_routes = {}
+        self.warm_start = warm_start
+        self.validate = validate
+        self.route_errors = None
+        self.round_budget = round_budget
+        self._detector = CountToInfinityDetector() if detect_count_to_infinity else None
         self.protocol = protocol
-        for i in range(1, N + 1):
-            self.routers[i] = Router(i, N, protocol)
+        self.incremental = incremental
+        # Incremental mode: router -> destinations that changed in its vector (None meaning all of them), and the
+        # links touched by events since the last round
+        self._changed = dict((i, None) for i in range(1, self.N + 1))
+        self._event_links = []
+        self._hooks = list(hooks or [])
+        # The round being simulated (or the last one simulated), the last round that had events, whether the last
+        # round changed nothing, and how much work the round has taken so far. simulate() picks up from these.
+        self.round = 0
+        self._last_event_time = 0
+        self._converged = False
+        self._vectors_sent = 0
+        self._entries_recomputed = 0
+        self._build_routers()
+
+    def _build_routers(self):
+        '''
+        Creates a router for every node in the network and connects each one to its neighbors.
+        :return: None
+        '''
+        for i in range(1, self.N + 1):
+            self.routers[i] = Router(i, self.N, self.protocol)
 
         # setting neighbors
-        for i in self.real_routing_values:
-            for j in self.real_routing_values:
-                self.routers[i].set_neighbor(self.routers[j], self.real_routing_values[i][j])
+        for i in self.routers:
+            for j, cost in self.topology.neighbors(i):
+                self.routers[i].set_neighbor(self.routers[j], cost)
+
+    def _get_vectors(self):
+        '''
+        Returns the distance vectors of all routers as flat arrays, indexed by (router - 1) * N + (destination - 1).
+        :return: tuple - (cost, next hop, hops) as array('l'), array('i'), array('i')
+        '''
+        cost, next_hop, hops = array('l'), array('i'), array('i')
+        for i in range(1, self.N + 1):
+            for entry in self.routers[i].get_distance_vector():
+                cost.append(entry.cost)
+                next_hop.append(entry.next_hop)
+                hops.append(entry.hops)
+        return cost, next_hop, hops
+
+    def _set_vectors(self, cost, next_hop, hops):
+        '''
+        Replaces the distance vectors of all routers, given in the layout of _get_vectors. Every router then sends its
+        vector to its neighbors, which is what they would be holding on to between two rounds anyway: a router that
+        changed last round sends again before anyone recalculates, and one that did not has nothing newer to send.
+        :param cost: array
+        :param next_hop: array
+        :param hops: array
+        :return: None
+        '''
+        N = self.N
+        for i in range(1, N + 1):
+            start = (i - 1) * N
+            self.routers[i].set_distance_vector([VectorEntry(cost[j], next_hop[j], hops[j])
+                                                 for j in range(start, start + N)])
+        for i in self.routers:
+            self.routers[i].send_distance_vector_to_neigbors()
+        self._forget_rows()
+
+    def _get_entries(self, routers, destination):
+        '''
+        Returns the entry of each of the routers for one destination
+        :param routers: [int...]
+        :param destination: int
+        :return: [(int, int, int)...] - (cost, next hop, hops) for each router
+        '''
+        entries = []
+        for r in routers:
+            entry = self.routers[r].get_entry(destination)
+            entries.append((entry.cost, entry.next_hop, entry.hops))
+        return entries
+
+    def add_hook(self, hook):
+        '''
+        Adds a hook (see NetworkHook in hooks.py) that will be called back as the simulation goes.
+        :param hook: NetworkHook
+        :return: None
+        '''
+        self._hooks.append(hook)
 
     def add_events(self, events):
         '''
-        Adds events to the list of events and sorts the list based on time
+        Adds events to the queue of events. Can also be called while simulating.
         :param events: [Event...]
         :return: None
         '''
-        self._events += events
-        self._events.sort()
+        self._events.add_events(events)
+
+    def add_event_stream(self, events):
+        '''
+        Adds a stream of events (in time order, e.g. an EventFile) that is only read as the simulation reaches it.
+        :param events: iterable of Event
+        :return: None
+        '''
+        self._events.add_stream(iter(events))
+
+    def _enact_events(self, events):
+        '''
+        Makes all the events that are due in the same round happen, in order.
+        :param events: [Event...]
+        :return: None
+        '''
+        for e in events:
+            self._enact_event(e)
+            for hook in self._hooks:
+                hook.event_applied(self, self.round, e)
 
     def _enact_event(self, event):
         '''
@@ -40,55 +179,210 @@ class Network(object):
         :return: None
         '''
         n1, n2 = event.link
-        self.real_routing_values[n1][n2] = event.cost
-        self.real_routing_values[n2][n1] = event.cost
+        if (self.incremental and n1 != n2):
+            self._event_links.append((n1, n2))
+            if (event.cost != -1 and self.topology.get_cost(n1, n2) == -1):
+                # A brand new link resets what both ends know about each other, which the other neighbors must hear
+                _add_destinations(self._changed, n1, [n2])
+                _add_destinations(self._changed, n2, [n1])
+        self.topology.set_cost(n1, n2, event.cost)
         self.routers[n1].set_neighbor(self.routers[n2], event.cost)
         self.routers[n2].set_neighbor(self.routers[n1], event.cost)
+        self._forget_rows((n1, n2))
 
     def simulate(self):
         '''
         Repeatedly runs the distance vector algorithm until the routers have convereged and no events are waiting to
-        happen. Will take care of adding details to self.details
+        happen. Will take care of adding details to self.details. Continues from the last simulated round, so a network
+        restored from a checkpoint picks up where it was saved.
+        :return: None
+        '''
+        if (self.warm_start):
+            warm_start_network(self)
+        while (not self.count_to_infinity_error and (len(self._events) or not self._converged)):
+            self.round += 1
+            t = self.round
+            self._vectors_sent = self._entries_recomputed = 0
+            if (len(self._hooks)):
+                round_start = default_timer()
+                for hook in self._hooks:
+                    hook.round_start(self, t)
+            due = self._events.pop_due(t)
+            if (len(due)):
+                self._enact_events(due)
+                self._last_event_time = t
+                if (self._detector is not None):
+                    self._detector.reset()
+            write_round = (t - 1) % self.details_every == 0
+            self._skip_details = not write_round or self.output_format != 'text'
+            if (write_round and self.details_changed_only):
+                self._held_details = []
+            self._add_str('Round ' + str(t) + "\n-----------------------------------------------------------")
+            self._converged = not self._run_round()
+            self._end_round_details(t, write_round)
+            if (t + 1 - self._last_event_time >= self.round_budget):
+                self.count_to_infinity_error = True
+            elif (self._detector is not None and not self._converged and self._no_events_within_budget()):
+                self.count_to_infinity_routes = self._detector.check(self)
+                self.count_to_infinity_error = len(self.count_to_infinity_routes) > 0
+            if (len(self._hooks)):
+                stats = {'round': t, 'events': len(due), 'vectors_sent': self._vectors_sent,
+                         'entries_recomputed': self._entries_recomputed, 'routers_changed': len(self._changed),
+                         'seconds': default_timer() - round_start}
+                for hook in self._hooks:
+                    hook.round_end(self, t, stats)
+
+        self._skip_details = self.output_format != 'text'
+        if (self.count_to_infinity_error):
+            self._write_details("\nCount to infinity error\n" + self._routes_str())
+        self.rounds = self.round
+        self.convergence_delay = str(self.round - self._last_event_time)
+        self._add_details(protocol_str[self.protocol] + ' (Final Output):\n')
+        if (self.detailed and self.output_format != 'text'):
+            self._emit_details(self._format_tables('final'))
+        self._validate_routes()
+
+    def _validate_routes(self):
+        '''
+        Checks the final routing tables against the shortest paths when validating. Networks that count to infinity
+        never converge, so they are not checked.
         :return: None
         '''
-        converged = False
-        t = 1
-        printing_state = 0
-        last_event_time = 0
+        if (self.validate and not self.count_to_infinity_error):
+            self.route_errors = check_routes(self)
 
-        while (len(self._events) or not converged):
-            converged = True
+    def _end_round_details(self, t, write_round):
+        '''
+        Keeps or drops the details held back during round t, and writes the routing tables at the end of the round
+        in the structured formats.
+        :param t: int
+        :param write_round: boolean - whether round t is one of the rounds the details are written for
+        :return: None
+        '''
+        keep = write_round and (not self._converged or not self.details_changed_only)
+        if (self._held_details is not None):
+            held, self._held_details = self._held_details, None
+            if (keep):
+                self._emit_details(''.join(held))
+        if (keep and self.detailed and self.output_format != 'text'):
+            self._emit_details(self._format_tables(t))
 
-            while (len(self._events) and self._events[0].time == t):
-                e = self._events.pop(0)
-                self._enact_event(e)
-                last_event_time = t
-            self._add_str('Round ' + str(t) + "\n-----------------------------------------------------------")
-            for i in self.routers:
-                self.routers[i].send_distance_vector_to_neigbors()
+    def _format_tables(self, t):
+        '''
+        Formats the routing tables of all routers in the structured output format
+        :param t: int or str - the round to label them with
+        :return: str
+        '''
+        return format_tables(self.output_format, protocol_str[self.protocol], t, self.N, *self._get_vectors())
 
-            printed = {}
+    def _row_str(self, i):
+        '''
+        Returns the routing table of router i in the text layout. Rows are only formatted again after they change.
+        :param i: int
+        :return: str
+        '''
+        row = self._formatted_rows.get(i)
+        if (row is None):
+            row = self._formatted_rows[i] = str(self.routers[i])
+        return row
+
+    def _forget_rows(self, routers=None):
+        '''
+        Drops the formatted routing tables of routers that changed
+        :param routers: iterable of int, or None for all of them
+        :return: None
+        '''
+        if (routers is None):
+            self._formatted_rows = {}
+        else:
+            for i in routers:
+                self._formatted_rows.pop(i, None)
+
+    def _no_events_within_budget(self):
+        '''
+        Indicates whether the round budget will run out before the next event, so that nothing can happen anymore that
+        would stop a count to infinity
+        :return: boolean
+        '''
+        next_time = self._events.peek_time()
+        return next_time is None or next_time >= self._last_event_time + self.round_budget
+
+    def _routes_str(self):
+        '''
+        Returns a line for every destination that was found to be counted to infinity, with the routers involved
+        :return: str
+        '''
+        s = ""
+        for d in sorted(self.count_to_infinity_routes):
+            s += "Destination " + str(d) + " counted to infinity by routers " + \
+                 ", ".join(str(r) for r in self.count_to_infinity_routes[d]) + "\n"
+        return s
+
+    def _run_round(self):
+        '''
+        Runs a single round of the distance vector algorithm: every router sends its distance vector to its neighbors
+        and then every router recalculates its own. Adds the per router details for the round.
+        :return: boolean - whether or not any router's distance vector changed
+        '''
+        return self._update_vectors(self._send_vectors())
+
+    def _send_vectors(self):
+        '''
+        The send half of a round. Normally every router sends its vector to all of its neighbors. In incremental mode
+        only the routers whose vector changed last round send it, plus the two ends of every link an event touched.
+        :return: {int: set or None} - the destinations each router has to recalculate (None meaning all of them), or
+        None if every router has to recalculate everything
+        '''
+        if (not self.incremental):
             for i in self.routers:
-                self._add_str('\tRouter ' + str(i) + ":")
-                if (self.detailed):
-                    if (i not in printed):
-                        self._add_details("")
-                        self._add_str("\n")
-                        printed[i] = True
-                change = self.routers[i].update_distance_vector()
-                if (change):
-                    converged = False
-                    printing_state = 0
-
-
-            printing_state += 1
-            t += 1
-            if (t - last_event_time >= 100):
-                self.details += "\nCount to infinity error\n"
-                self.count_to_infinity_error = True
-                break
-        self.convergence_delay = str(t - last_event_time -1)
-        self._add_details(protocol_str[self.protocol] + ' (Final Output):\n')
+                self._vectors_sent += self.routers[i].send_distance_vector_to_neigbors()
+            return None
+
+        dirty = {}
+        for i in self._changed:
+            for n in self.routers[i].get_neighbor_nums():
+                self.routers[i].send_distance_vector_to(n)
+                self._vectors_sent += 1
+                _add_destinations(dirty, n, self._changed[i])
+        for n1, n2 in self._event_links:
+            if (n2 in self.routers[n1].get_neighbor_nums()):
+                self.routers[n1].send_distance_vector_to(n2)
+                self.routers[n2].send_distance_vector_to(n1)
+                self._vectors_sent += 2
+            _add_destinations(dirty, n1, None)
+            _add_destinations(dirty, n2, None)
+        self._event_links = []
+        return dirty
+
+    def _update_vectors(self, dirty):
+        '''
+        The update half of a round. In incremental mode a router only recalculates the destinations that changed in
+        what it received, or every destination if one of its links changed. That gives the same result as
+        recalculating everything, since an entry only depends on the link costs and the neighbors' entries for the
+        same destination.
+        :param dirty: the return value of _send_vectors
+        :return: boolean - whether or not any router's distance vector changed
+        '''
+        self._changed = {}
+        for i in self.routers:
+            self._add_str('\tRouter ' + str(i) + ":")
+            if (self.detailed):
+                self._add_details("")
+                self._add_str("\n")
+            if (dirty is None or dirty.get(i, ()) is None):
+                changed = self.routers[i].update_destinations(None)
+                self._entries_recomputed += self.N - 1
+            elif (i in dirty):
+                changed = self.routers[i].update_destinations(dirty[i])
+                self._entries_recomputed += len(dirty[i]) - (i in dirty[i])
+            else:
+                continue
+            if (len(changed)):
+                self._changed[i] = set(changed)
+                self._forget_rows((i,))
+                for hook in self._hooks:
+                    hook.router_changed(self, self.round, i, changed)
+        return len(self._changed) > 0
 
     def _add_details(self, s):
         '''
@@ -97,9 +391,9 @@ class Network(object):
         :param s: string
         :return: None
         '''
-        self.details += s
-        for i in self.routers:
-            self.details += "\t" + str(self.routers[i]) + '\n'
+        if (not self.detailed or self._skip_details):
+            return
+        self._write_details(s + ''.join(['\t' + self._row_str(i) + '\n' for i in self.routers]))
 
     def _add_str(self, s):
         '''
@@ -107,51 +401,271 @@ class Network(object):
         :param s: str
         :return: None
         '''
-        self.details += s + '\n'
+        self._write_details(s + '\n')
+
+    def _write_details(self, s):
+        '''
+        Sends s to the details sink, or keeps it for self.details if there is none. Nothing is kept when the network
+        is not detailed or the details of the round are being left out.
+        :param s: str
+        :return: None
+        '''
+        if (not self.detailed or self._skip_details):
+            return
+        if (self._held_details is not None):
+            self._held_details.append(s)
+        else:
+            self._emit_details(s)
+
+    def _emit_details(self, s):
+        '''
+        Sends s straight to the details sink, or keeps it for self.details if there is none.
+        :param s: str
+        :return: None
+        '''
+        if (self._details_sink is not None):
+            self._details_sink.write(s)
+        else:
+            self._details.append(s)
+
+    @property
+    def details(self):
+        '''
+        The detailed output of this network. Empty if it was streamed to a details sink.
+        :return: str
+        '''
+        if (len(self._details) > 1):
+            self._details = [''.join(self._details)]
+        return ''.join(self._details)
 
     def get_output(self):
         '''
-        Returns the final output which contains the routing table for each router.
+        Returns the final output which contains the routing table for each router, in the output format.
         :return: str
         '''
-        s = ""
-        for i in self.routers:
-            s += str(self.routers[i]) + "\n"
+        if (self.output_format != 'text'):
+            name = protocol_str[self.protocol]
+            return self._format_tables('final') + format_summary(self.output_format, name, self.rounds,
+                                                                 self.convergence_delay, self.count_to_infinity_error)
+        s = ''.join([self._row_str(i) + '\n' for i in self.routers])
         if (not self.count_to_infinity_error):
-            s += "Convergence Delay: " + self.convergence_delay + " rounds.\n"
+            s += self._convergence_str()
         else:
-            s += "Count to infinity error encountered\n"
+            s += "Count to infinity error encountered\n" + self._routes_str()
         return s
 
-def files_to_network(network_file, events_file, detailed):
+    def _convergence_str(self):
+        '''
+        Returns the line of the output with the convergence delay
+        :return: str
+        '''
+        return "Convergence Delay: " + self.convergence_delay + " rounds.\n"
+
+def protocol_num(protocol):
+    '''
+    Returns the number of a protocol given by number or by one of PROTOCOL_NAMES
+    :param protocol: int or str
+    :return: int
+    '''
+    if (protocol in PROTOCOL_NAMES):
+        return PROTOCOL_NAMES[protocol]
+    return int(protocol)
+
+def _add_destinations(destinations, router, new):
+    '''
+    Adds new to the set of destinations kept for router in the dict destinations. None stands for every destination.
+    :param destinations: {int: set or None}
+    :param router: int
+    :param new: [int...] or None
+    :return: None
+    '''
+    if (new is None or destinations.get(router, ()) is None):
+        destinations[router] = None
+    else:
+        destinations.setdefault(router, set()).update(new)
+
+class NetworkResult(object):
+    '''
+    Holds everything that gets written out about a simulated network (its output, details and convergence info)
+    without the routers themselves. This is what comes back from a worker process when networks are simulated in
+    parallel, and it has the same get_output()/details interface as a Network.
+    '''
+    def __init__(self, network):
+        self.protocol = network.protocol
+        self.details = network.details
+        self.count_to_infinity_error = network.count_to_infinity_error
+        self.count_to_infinity_routes = network.count_to_infinity_routes
+        self.rounds = network.rounds
+        self.convergence_delay = network.convergence_delay
+        self.output_format = network.output_format
+        self.route_errors = network.route_errors
+        self._output = network.get_output()
+
+    def get_output(self):
+        '''
+        Returns the final output which contains the routing table for each router.
+        :return: str
+        '''
+        return self._output
+
+def simulate_protocol(network_class, topology, events, protocol, detailed, network_options=None, cache=None):
+    '''
+    Simulates a single variation of the algorithm on its own copy of the topology and events. If a cache of converged
+    states is given (see state_cache.py), the simulation starts from the cached state when it can, and adds the state
+    to the cache otherwise.
+    :param network_class: Network or a subclass of it
+    :param topology: Topology
+    :param events: [Event...] or EventFile
+    :param protocol: int
+    :param detailed: boolean
+    :param network_options: dict - extra keyword arguments for network_class (e.g. incremental)
+    :param cache: ConvergedStateCache
+    :return: Network
+    '''
+    n = None
+    if (cache is not None):
+        n = cache.load(topology, protocol, _first_event_time(events), network_class, detailed, network_options)
+    if (n is None):
+        n = network_class(topology.copy(), protocol, detailed, **(network_options or {}))
+        if (cache is not None and not detailed):
+            n.add_hook(cache.hook())
+    if (isinstance(events, EventFile)):
+        n.add_event_stream(events)
+    else:
+        n.add_events(events)
+    n.simulate()
+    return n
+
+def _first_event_time(events):
+    '''
+    Returns the time of the first event, or None if there are none
+    :param events: [Event...] or EventFile
+    :return: int
+    '''
+    if (isinstance(events, EventFile)):
+        # Event files that are streamed are in time order
+        for e in events:
+            return e.time
+        return None
+    return min(e.time for e in events) if len(events) else None
+
+def _simulate_protocol_worker(args):
+    '''
+    Entry point of the worker processes used by files_to_network. Only the NetworkResult is sent back, pickling the
+    routers themselves would be slow and can hit the recursion limit on large networks.
+    :param args: tuple - the arguments of simulate_protocol and the file to stream the details into (or None)
+    :return: NetworkResult
+    '''
+    args, details_file_name = args
+    if (details_file_name is None):
+        return NetworkResult(simulate_protocol(*args))
+    network_class, topology, events, protocol, detailed, network_options, cache = args
+    with open_details_writer(details_file_name) as sink:
+        network_options = dict(network_options or {}, details_sink=sink)
+        return NetworkResult(simulate_protocol(network_class, topology, events, protocol, detailed, network_options,
+                                               cache))
+
+def _details_frame(protocol, network_options):
+    '''
+    Returns what goes before and after the details of a protocol in detailed-output.txt. The details of the structured
+    output formats are not framed, every record already names its protocol.
+    :param protocol: int
+    :param network_options: dict
+    :return: (str, str)
+    '''
+    if ((network_options or {}).get('output_format', 'text') != 'text'):
+        return '', ''
+    return protocol_str[protocol] + DETAILS_HEADER, DETAILS_FOOTER
+
+def files_to_network(network_file, events_file, detailed, network_class=Network, jobs=1, network_options=None,
+                     details_writer=None, stream_events=False, cache=None):
     '''
     Given the network file, events file and the detailed flag, this will run the distance vector algorithm
     3 times (once for each variation of the algorithm) and return an array of networks that have converged.
+    If jobs is more than 1, the variations are simulated in parallel worker processes and NetworkResults are returned
+    instead of the networks themselves. Either way they are in the order of protocol_str.
+    If detailed and a details_writer is given, each protocol's details are streamed into it (framed by its name,
+    DETAILS_HEADER and DETAILS_FOOTER, unless the output format is a structured one) rather than kept in the networks.
+    If stream_events is set, the events file (which must then be in time order) is not read up front, every
+    simulation streams the events from it as it needs them.
+    If a cache of converged states is given, simulations that are not detailed start from the state the topology
+    converges to when their first event comes after it.
     :param network_file: file
     :param events_file: file
     :param detailed: boolean
-    :return: [Network...]
+    :param network_class: the simulation engine to use, Network or a subclass of it (e.g. MatrixNetwork)
+    :param jobs: int - number of worker processes
+    :param network_options: dict - extra keyword arguments for network_class (e.g. incremental)
+    :param details_writer: file-like object, e.g. a DetailsWriter
+    :param stream_events: boolean
+    :param cache: ConvergedStateCache
+    :return: [Network...] or [NetworkResult...]
     '''
-    lines = network_file.read().splitlines()
+    topology = file_to_topology(network_file)
     network_file.close()
-    N = int(lines[0])
-    real_routing_values = {}
-    for i in range(1, N + 1):
-        real_routing_values[i] = {}
-        for j in range(1, N + 1):
-            real_routing_values[i][j] = -1 * int(i != j)
-
-    for line in lines[1:]:
-        n1, n2, c = [int(x) for x in line.split(" ") if (len(x) > 0)]
-        real_routing_values[n1][n2] = c
-        real_routing_values[n2][n1] = c
-
-    events = file_to_events(events_file)
+
+    events = EventFile(events_file.name) if stream_events else file_to_events(events_file)
     events_file.close()
-    networks = []
-    for i in range(3):
-        n = Network(N, deepcopy(real_routing_values), i, detailed)
-        n.add_events(deepcopy(events))
-        n.simulate()
-        networks.append(n)
-    return networks
+    work = [(network_class, topology, events, i, detailed, network_options, cache) for i in range(len(protocol_str))]
+    if (not detailed):
+        details_writer = None
+
+    if (jobs <= 1):
+        networks = []
+        for args in work:
+            if (details_writer is not None):
+                details_writer.write(_details_frame(args[3], network_options)[0])
+                args = args[:5] + (dict(network_options or {}, details_sink=details_writer),) + args[6:]
+            networks.append(simulate_protocol(*args))
+            if (details_writer is not None):
+                details_writer.write(_details_frame(args[3], network_options)[1])
+        return networks
+
+    # Only imported when needed, importing this module should stay cheap for in-process use (see simulation.py)
+    from multiprocessing import Pool
+    from shutil import copyfileobj
+    import tempfile
+
+    # Every worker streams its details into a temporary file, which are then copied over in order
+    details_file_names = [None] * len(work)
+    if (details_writer is not None):
+        for i in range(len(work)):
+            fd, details_file_names[i] = tempfile.mkstemp(suffix='-details.txt')
+            os.close(fd)
+    pool = Pool(min(jobs, len(work)))
+    try:
+        networks = pool.map(_simulate_protocol_worker, zip(work, details_file_names))
+        if (details_writer is not None):
+            for i, details_file_name in enumerate(details_file_names):
+                details_writer.write(_details_frame(i, network_options)[0])
+                with open(details_file_name) as f:
+                    copyfileobj(f, details_writer, 1 << 20)
+                details_writer.write(_details_frame(i, network_options)[1])
+        return networks
+    finally:
+        pool.close()
+        pool.join()
+        for details_file_name in details_file_names:
+            if (details_file_name is not None):
+                os.remove(details_file_name)
+
+def write_output(f, networks):
+    '''
+    Writes the final output of each network to f, in the format of output.txt: the name of the protocol, a line and
+    the routing tables with the convergence delay. Networks with a structured output format are written one after
+    the other in that format instead.
+    :param f: file
+    :param networks: [Network...] or [NetworkResult...]
+    :return: None
+    '''
+    fmt = networks[0].output_format if len(networks) else 'text'
+    if (fmt != 'text'):
+        f.write(format_header(fmt))
+        for n in networks:
+            f.write(n.get_output())
+        return
+    for n in networks:
+        f.write(protocol_str[n.protocol])
+        f.write("\n------------------------\n")
+        f.write(n.get_output())
+        f.write('\n')
@@ -0,0 +1,88 @@
+'''
+Formats routing tables for output.txt and detailed-output.txt. The tables are kept as structured data (next hops, hops
+and costs) and only formatted when they are written out, in bulk. There are three formats:
+    text  - the layout of the assignment: the router number, then "next hop,hops" for every destination (format_row)
+    csv   - one row per router and destination, plus one summary row per protocol
+    jsonl - one JSON object per router, plus one summary object per protocol
+'''
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+FORMATS = ('text', 'csv', 'jsonl')
+
+CSV_FIELDS = ['protocol', 'round', 'router', 'destination', 'cost', 'next_hop', 'hops', 'convergence_delay',
+              'count_to_infinity_error']
+
+
+def format_row(router_num, next_hops, hops):
+    '''
+    Formats the routing table of a single router in the text layout
+    :param router_num: int
+    :param next_hops: [int...] - next hop for destinations 1 to N
+    :param hops: [int...] - hop count for destinations 1 to N
+    :return: str
+    '''
+    return str(router_num) + '\t' + ''.join(['%s,%s \t' % entry for entry in zip(next_hops, hops)])
+
+
+def format_header(fmt):
+    '''
+    Returns what goes at the very start of a file in the given format
+    :param fmt: str - one of FORMATS
+    :return: str
+    '''
+    if (fmt == 'csv'):
+        return _csv_rows([CSV_FIELDS])
+    return ''
+
+
+def format_tables(fmt, protocol, t, N, cost, next_hop, hops):
+    '''
+    Formats the routing tables of all routers in one of the structured formats. The tables are given as flat arrays
+    indexed by (router - 1) * N + (destination - 1) (see Network._get_vectors).
+    :param fmt: str - 'csv' or 'jsonl'
+    :param protocol: str - name of the protocol
+    :param t: int or str - the round the tables are from
+    :param N: int
+    :param cost: array
+    :param next_hop: array
+    :param hops: array
+    :return: str
+    '''
+    import json
+    if (fmt == 'csv'):
+        return _csv_rows([protocol, t, r, d, cost[(r - 1) * N + d - 1], next_hop[(r - 1) * N + d - 1],
+                          hops[(r - 1) * N + d - 1], '', ''] for r in range(1, N + 1) for d in range(1, N + 1))
+    return ''.join([json.dumps({'protocol': protocol, 'round': t, 'router': r,
+                                'cost': list(cost[(r - 1) * N:r * N]), 'next_hop': list(next_hop[(r - 1) * N:r * N]),
+                                'hops': list(hops[(r - 1) * N:r * N])}, sort_keys=True) + '\n'
+                    for r in range(1, N + 1)])
+
+
+def format_summary(fmt, protocol, rounds, convergence_delay, count_to_infinity_error):
+    '''
+    Formats how a simulation ended in one of the structured formats
+    :param fmt: str - 'csv' or 'jsonl'
+    :param protocol: str - name of the protocol
+    :param rounds: int
+    :param convergence_delay: str
+    :param count_to_infinity_error: boolean
+    :return: str
+    '''
+    import json
+    if (fmt == 'csv'):
+        return _csv_rows([[protocol, rounds, '', '', '', '', '', '' if count_to_infinity_error else convergence_delay,
+                           int(count_to_infinity_error)]])
+    return json.dumps({'protocol': protocol, 'rounds': rounds,
+                       'convergence_delay': None if count_to_infinity_error else int(convergence_delay),
+                       'count_to_infinity_error': count_to_infinity_error}, sort_keys=True) + '\n'
+
+
+def _csv_rows(rows):
+    # csv and json are only imported by the structured formats, the text format is all most runs need
+    import csv
+    f = StringIO()
+    csv.writer(f, lineterminator='\n').writerows(rows)
+    return f.getvalue()
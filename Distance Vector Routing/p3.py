@@ -1,32 +1,152 @@
+from __future__ import print_function
 import sys
 
-from network import files_to_network
+from network import files_to_network, write_output, protocol_str
+import simulation
+from details_writer import open_details_writer
+from hooks import TimelineCollector
+from checkpoint import CheckpointHook
+from state_cache import ConvergedStateCache
+from output_format import FORMATS, format_header
+
+def usage():
+    print("Usage: ./p3.py [--jobs <n>] [--incremental] [--stream-events] [--timeline <file>] "
+          "[--checkpoint <file>] [--round-budget <n>] [--detect-count-to-infinity] "
+          "[--cache <directory>] [--partitions <n>] [--format text|csv|jsonl] [--details-every <k>] "
+          "[--details-changed-only] [--warm-start] [--validate] "
+          "<topology filename> <event change filename> <binary flag> [engine: object|matrix|async|partitioned]")
+    sys.exit(0)
+
+def report_route_errors(networks):
+    '''
+    Prints whether the final routing tables of each network match the shortest paths, with the first few routes that
+    do not
+    :param networks: [Network...] or [NetworkResult...]
+    :return: boolean - whether they all match
+    '''
+    valid = True
+    for n in networks:
+        if (n.route_errors is None):
+            print(protocol_str[n.protocol] + ": not checked (count to infinity error)")
+            continue
+        if (not len(n.route_errors)):
+            print(protocol_str[n.protocol] + ": OK")
+            continue
+        valid = False
+        print(protocol_str[n.protocol] + ": " + str(len(n.route_errors)) + " routes differ from the shortest paths")
+        for router, destination, want, got in n.route_errors[:10]:
+            print("\trouter %d to %d: expected cost %d via %d in %d hops, got cost %d via %d in %d hops" %
+                  ((router, destination) + tuple(want) + tuple(got)))
+    return valid
 
 def main(argv):
-    if (len(argv) != 3):
-        print "Usage: ./p3.py <topology filename> <event change filename> <binary flag>"
-        sys.exit(0)
+    jobs = 1
+    if ('--jobs' in argv):
+        i = argv.index('--jobs')
+        if (i + 1 >= len(argv)):
+            usage()
+        jobs = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    network_options = {}
+    if ('--incremental' in argv):
+        argv = [arg for arg in argv if arg != '--incremental']
+        network_options['incremental'] = True
+    timeline = None
+    if ('--timeline' in argv):
+        i = argv.index('--timeline')
+        if (i + 1 >= len(argv) or jobs > 1):
+            # The timeline is written as the networks simulate, which has to happen in this process
+            usage()
+        timeline = TimelineCollector(argv[i + 1])
+        network_options['hooks'] = [timeline]
+        argv = argv[:i] + argv[i + 2:]
+    if ('--checkpoint' in argv):
+        # Saves each protocol's final state, to resume or fork with checkpoint.py
+        i = argv.index('--checkpoint')
+        if (i + 1 >= len(argv)):
+            usage()
+        network_options['hooks'] = network_options.get('hooks', []) + [CheckpointHook(argv[i + 1], final=True)]
+        argv = argv[:i] + argv[i + 2:]
+    if ('--round-budget' in argv):
+        i = argv.index('--round-budget')
+        if (i + 1 >= len(argv)):
+            usage()
+        network_options['round_budget'] = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    if ('--detect-count-to-infinity' in argv):
+        argv = [arg for arg in argv if arg != '--detect-count-to-infinity']
+        network_options['detect_count_to_infinity'] = True
+    if ('--partitions' in argv):
+        i = argv.index('--partitions')
+        if (i + 1 >= len(argv)):
+            usage()
+        network_options['partitions'] = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    if ('--format' in argv):
+        i = argv.index('--format')
+        if (i + 1 >= len(argv) or argv[i + 1] not in FORMATS):
+            usage()
+        network_options['output_format'] = argv[i + 1]
+        argv = argv[:i] + argv[i + 2:]
+    if ('--details-every' in argv):
+        i = argv.index('--details-every')
+        if (i + 1 >= len(argv) or int(argv[i + 1]) < 1):
+            usage()
+        network_options['details_every'] = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    if ('--details-changed-only' in argv):
+        argv = [arg for arg in argv if arg != '--details-changed-only']
+        network_options['details_changed_only'] = True
+    if ('--warm-start' in argv):
+        argv = [arg for arg in argv if arg != '--warm-start']
+        network_options['warm_start'] = True
+    validate = '--validate' in argv
+    if (validate):
+        argv = [arg for arg in argv if arg != '--validate']
+        network_options['validate'] = True
+    cache = None
+    if ('--cache' in argv):
+        i = argv.index('--cache')
+        if (i + 1 >= len(argv)):
+            usage()
+        cache = ConvergedStateCache(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    stream_events = '--stream-events' in argv
+    argv = [arg for arg in argv if arg != '--stream-events']
+    if (len(argv) not in (3, 4)):
+        usage()
+    if ('partitions' in network_options and (len(argv) != 4 or argv[3] != 'partitioned')):
+        # Only the partitioned engine has partitions
+        usage()
 
     topology_file_name = argv[0]
     event_change_file_name = argv[1]
     detailed = int(argv[2])
-    networks = files_to_network(open(topology_file_name), open(event_change_file_name), detailed)
+    engine = argv[3] if len(argv) == 4 else 'object'
+    if (engine == 'async' and network_options.get('detect_count_to_infinity')):
+        # There are no rounds for the detector to compare
+        usage()
+    if (engine == 'partitioned' and jobs > 1):
+        # The partitions have their own worker processes, which pool workers can not start
+        usage()
+    try:
+        network_class = simulation.network_class(engine)
+    except ValueError:
+        usage()
+    f2 = open_details_writer('./detailed-output.txt')
+    if (detailed):
+        f2.write(format_header(network_options.get('output_format', 'text')))
+    networks = files_to_network(open(topology_file_name), open(event_change_file_name), detailed, network_class, jobs,
+                                network_options, f2, stream_events, cache)
+    f2.close()
+    if (timeline is not None):
+        timeline.close()
     f = open('./output.txt', 'w+')
-    f2 = open('./detailed-output.txt','w+')
-    intro_texts = ['Basic Distance Vector Routing', 'Split Horizon', 'Split Horizon with Poison']
-    for n in range(3):
-        f.write(intro_texts[n])
-        f.write("\n------------------------\n")
-        f.write(networks[n].get_output())
-        if (detailed):
-            f2.write(intro_texts[n] + "\n-----------------------------------------------------------\n")
-            f2.write(networks[n].details)
-            #f2.write(networks[n].get_output())
-            f2.write('\n \n \n \n')
-        f.write('\n')
+    write_output(f, networks)
     f.close()
+    if (validate and not report_route_errors(networks)):
+        sys.exit(1)
 
 if (__name__ == "__main__"):
     main(sys.argv[1:])
-
-sys.exit(0)
+    sys.exit(0)
@@ -0,0 +1,180 @@
+import ctypes
+import multiprocessing
+import traceback
+
+import numpy as np
+
+from matrix_network import MatrixNetwork
+
+
+def _fork_context():
+    '''
+    The workers rely on inheriting the network (and its shared memory) when they are forked
+    :return: multiprocessing context, or the multiprocessing module on versions without contexts
+    '''
+    if (hasattr(multiprocessing, 'get_context')):
+        return multiprocessing.get_context('fork')
+    return multiprocessing
+
+
+class PartitionedNetwork(MatrixNetwork):
+    '''
+    MatrixNetwork split over several worker processes, for networks too large for one core. The routers are split into
+    partitions of consecutive router numbers with about the same number of links each, and every partition is
+    computed by its own worker each round.
+
+    The cost, next hop and hop count arrays live in shared memory, twice: the vectors of the current round, which every
+    worker reads, and the vectors of the next round, which every worker writes its own rows of. A worker only reads the
+    rows of its own routers and their neighbors, so the vectors of the routers on a partition boundary are all that
+    goes from one partition to another. The two sets of arrays swap roles every round. The events of a round are sent
+    to the workers so they can keep their copy of the topology up to date.
+
+    Rounds, output, details and convergence delay are the same as those of MatrixNetwork (and so Network). The workers
+    are started when a simulation starts and stopped when it ends.
+    '''
+    def __init__(self, topology, protocol, detailed=True, partitions=None, **network_options):
+        '''
+        :param partitions: int - number of worker processes (default: one per CPU)
+        Everything else is the same as for Network.
+        '''
+        self.partitions = max(1, min(partitions or multiprocessing.cpu_count(), topology.N or 1))
+        self._workers = []
+        self._round_events = []
+        super(PartitionedNetwork, self).__init__(topology, protocol, detailed, **network_options)
+
+    def _build_routers(self):
+        '''
+        Builds the cost, next hop and hop count arrays like MatrixNetwork does, in shared memory.
+        :return: None
+        '''
+        super(PartitionedNetwork, self)._build_routers()
+        N = self.N
+        self._buffers = []
+        for _ in range(2):
+            arrays = []
+            for initial in (self._cost, self._next_hop, self._hops):
+                shared = np.frombuffer(multiprocessing.RawArray(ctypes.c_int64, N * N), dtype=np.int64).reshape(N, N)
+                shared[:] = initial
+                arrays.append(shared)
+            self._buffers.append(tuple(arrays))
+        self._cost, self._next_hop, self._hops = self._buffers[0]
+        self._changed_rows = np.frombuffer(multiprocessing.RawArray(ctypes.c_int8, max(N, 1)), dtype=np.int8)
+
+    def _set_vectors(self, cost, next_hop, hops):
+        '''
+        Replaces the cost, next hop and hop count arrays, given in the layout of Network._get_vectors. They are copied
+        into the shared arrays of the current round.
+        :param cost: array
+        :param next_hop: array
+        :param hops: array
+        :return: None
+        '''
+        for target, a in zip((self._cost, self._next_hop, self._hops), (cost, next_hop, hops)):
+            target[:] = np.frombuffer(a, dtype=np.dtype(a.typecode)).reshape(self.N, self.N)
+        self._forget_rows()
+
+    def _enact_event(self, event):
+        self._round_events.append((event.link[0], event.link[1], event.cost))
+        super(PartitionedNetwork, self)._enact_event(event)
+
+    def _partition_bounds(self):
+        '''
+        Splits the rows into partitions of consecutive rows with about the same amount of work (links + 1) each
+        :return: [int...] - the first row of every partition, followed by N
+        '''
+        degree = self._csr_arrays()[1]
+        work = np.cumsum(degree + 1)
+        total = int(work[-1]) if self.N else 0
+        bounds = [0]
+        for p in range(1, self.partitions):
+            bounds.append(max(bounds[-1], int(np.searchsorted(work, total * p // self.partitions))))
+        bounds.append(self.N)
+        return bounds
+
+    def _start_workers(self):
+        '''
+        Forks a worker for every partition. The workers get the network as it is now, so the events applied so far
+        need not be sent to them.
+        :return: None
+        '''
+        bounds = self._partition_bounds()
+        context = _fork_context()
+        self._round_events = []
+        for p in range(self.partitions):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=self._worker, args=(worker_connection, bounds[p], bounds[p + 1]))
+            process.daemon = True
+            process.start()
+            worker_connection.close()
+            self._workers.append((process, connection))
+
+    def _stop_workers(self):
+        for process, connection in self._workers:
+            try:
+                connection.send(None)
+                connection.close()
+            except (IOError, OSError):
+                pass
+            process.join()
+        self._workers = []
+
+    def _worker(self, connection, first, last):
+        '''
+        Main loop of a worker process. Each message is the events of the round and the index of the buffers holding
+        the current vectors (or None to stop). The worker computes its rows into the other buffers, marks which of them
+        changed and answers with None, or the error it ran into.
+        :param connection: Connection
+        :param first: int - first row of the partition
+        :param last: int - one past the last row of the partition
+        :return: None
+        '''
+        while (True):
+            message = connection.recv()
+            if (message is None):
+                break
+            events, current = message
+            try:
+                for n1, n2, cost in events:
+                    self.topology.set_cost(n1, n2, cost)
+                self._cost, self._next_hop, self._hops = self._buffers[current]
+                cost, next_hop, hops = self._buffers[1 - current]
+                self._compute_rows(first, last, cost, next_hop, hops)
+                rows = slice(first, last)
+                differs = (cost[rows] != self._cost[rows]) | (next_hop[rows] != self._next_hop[rows]) | \
+                          (hops[rows] != self._hops[rows])
+                self._changed_rows[rows] = differs.any(axis=1)
+                connection.send(None)
+            except Exception:
+                connection.send(traceback.format_exc())
+        connection.close()
+
+    def simulate(self):
+        try:
+            super(PartitionedNetwork, self).simulate()
+        finally:
+            self._stop_workers()
+
+    def _compute_round(self):
+        '''
+        Has the workers compute the new vectors of their partitions into the buffers that do not hold the current ones.
+        :return: tuple - (cost, next_hop, hops) arrays
+        '''
+        if (not len(self._workers)):
+            self._start_workers()
+        current = 0 if self._cost is self._buffers[0][0] else 1
+        for process, connection in self._workers:
+            connection.send((self._round_events, current))
+        self._round_events = []
+        errors = [connection.recv() for process, connection in self._workers]
+        for error in errors:
+            if (error is not None):
+                raise RuntimeError('partition worker failed:\n' + error)
+        return self._buffers[1 - current]
+
+    def _run_round(self):
+        '''
+        Runs a single round of the distance vector algorithm, with the workers computing the new vectors.
+        :return: boolean - whether or not any router's distance vector changed
+        '''
+        cost, next_hop, hops = self._compute_round()
+        return self._finish_round(cost, next_hop, hops, np.nonzero(self._changed_rows)[0])
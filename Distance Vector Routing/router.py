@@ -1,6 +1,5 @@
 import sys
 from routing_table import RoutingTable
-from copy import deepcopy
 class Router(object):
     def __init__(self, router_num, N, protocol):
         self._router_num = router_num
@@ -25,7 +24,7 @@ class Router(object):
         if (neighbor is self):
             return
         if (cost == -1):
-            if (self._neighbors.get(neighbor.get_router_num) is not None):
+            if (self._neighbors.get(neighbor.get_router_num()) is not None):
                 del self._neighbors[neighbor.get_router_num()]
         else:
             self._neighbors[neighbor.get_router_num()] = neighbor
@@ -41,14 +40,48 @@ class Router(object):
         '''
         self._routing_table.set_neighbor_vector(src, vector)
 
+    def receive_distance_vector_changes(self, src, vector):
+        '''
+        Like receive_distance_vector, but also returns the destinations that changed compared to the last vector
+        received from src, which are the only ones that have to be recalculated
+        :param src: int
+        :param vector: {}
+        :return: [int...]
+        '''
+        return self._routing_table.replace_neighbor_vector(src, vector)
+
+    def get_neighbor_nums(self):
+        '''
+        Returns the router nums of this router's neighbors
+        :return: [int...]
+        '''
+        return list(self._neighbors)
+
     def send_distance_vector_to_neigbors(self):
         '''
         Sends this routers distance vector to all of its neighbors.
-        :return: None
+        :return: int - the number of vectors sent
         '''
         for n in self._neighbors:
-            dv = self._routing_table.get_distance_vector_for_neighbor(n)
-            self._neighbors[n].receive_distance_vector(self.get_router_num(), dv)
+            self.send_distance_vector_to(n)
+        return len(self._neighbors)
+
+    def get_distance_vector_for(self, n):
+        '''
+        Returns the distance vector this router would send to the neighbor n.
+        :param n: int
+        :return: {}
+        '''
+        return self._routing_table.get_distance_vector_for_neighbor(n)
+
+    def send_distance_vector_to(self, n):
+        '''
+        Sends this routers distance vector to the neighbor n.
+        :param n: int
+        :return: None
+        '''
+        dv = self.get_distance_vector_for(n)
+        self._neighbors[n].receive_distance_vector(self.get_router_num(), dv)
 
     def update_distance_vector(self):
         '''
@@ -56,10 +89,39 @@ class Router(object):
         indicating whether or not any changes where made.
         :return: boolean
         '''
-        old_dv = deepcopy(self._routing_table.get_distance_vector_for_neighbor(-1))
-        self._routing_table.update_distance_vector()
-        dv = self._routing_table.get_distance_vector_for_neighbor(-1)
-        return (dv != old_dv)
+        return len(self._routing_table.update_distance_vector()) > 0
+
+    def update_destinations(self, destinations):
+        '''
+        Recalculates only the given destinations of the distance vector. Used by the incremental mode of Network, where
+        the other entries are known not to be affected.
+        :param destinations: [int...] or None for every destination
+        :return: [int...] - the destinations whose entry changed
+        '''
+        return self._routing_table.update_distance_vector(destinations)
+
+    def get_distance_vector(self):
+        '''
+        Returns this router's distance vector
+        :return: [VectorEntry...] - for destinations 1 to N
+        '''
+        return self._routing_table.get_entries()
+
+    def get_entry(self, destination):
+        '''
+        Returns this router's entry for destination
+        :param destination: int
+        :return: VectorEntry
+        '''
+        return self._routing_table.get_entry(destination)
+
+    def set_distance_vector(self, entries):
+        '''
+        Replaces this router's distance vector. The neighbors only hear about it the next time it is sent.
+        :param entries: [VectorEntry...] - for destinations 1 to N
+        :return: None
+        '''
+        self._routing_table.set_entries(entries)
 
     def __str__(self):
         return str(self._routing_table)
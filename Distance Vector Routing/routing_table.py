@@ -1,4 +1,7 @@
-from copy import deepcopy
+from bisect import insort
+
+from output_format import format_row
+
 BASIC_PROTOCOL = 0
 SPLIT_HORIZON_PROTOCOL = 1
 SPLIT_HORIZON_WITH_POISON_REVERSE_PROTOCOL = 2
@@ -12,6 +15,13 @@ class RoutingTable:
         self._router_num = router_num
         self._distance_vector = {}
         self._neighbors = {}
+        # Neighbors in ascending order, so that ties are broken towards the lowest router number
+        self._neighbor_order = []
+        # The distance vector as advertised to each neighbor (a single one shared by all neighbors with the basic
+        # protocol), kept up to date as entries change. A view that has been sent is never modified again, since the
+        # neighbor holds on to it: it is copied the first time it has to be patched after that.
+        self._views = {}
+        self._sent_views = set()
         for i in range(1, self._N + 1):
             self._distance_vector[i] = VectorEntry()
         self._distance_vector[self._router_num] = VectorEntry(next_hop=self._router_num, cost= 0, hops=0)
@@ -19,20 +29,57 @@ class RoutingTable:
     def get_distance_vector_for_neighbor(self, n):
         '''
         Returns a distance vector meant for the neighbor n. This will return a distance vector that fits the algorithm
-        being run (detemined by self.protocol).
+        being run (detemined by self.protocol). The same vector is returned for as long as nothing in it changes, so it
+        must not be modified.
         :param n: int
         :return: distance vector
         '''
-        dv = {}
-        for i in self._distance_vector:
-            if (self.protocol == SPLIT_HORIZON_PROTOCOL):
-                if self._distance_vector[i].next_hop != n:
-                    dv[i] = self._distance_vector[i]
-            elif (self.protocol == SPLIT_HORIZON_WITH_POISON_REVERSE_PROTOCOL):
-                dv[i] = self._distance_vector[i] if self._distance_vector[i].next_hop != n else VectorEntry()
-            else:
-                dv[i] = self._distance_vector[i]
-        return dv
+        key = None if self.protocol == BASIC_PROTOCOL else n
+        view = self._views.get(key)
+        if (view is None):
+            view = self._views[key] = {}
+            for i in self._distance_vector:
+                self._advertise(view, key, i)
+        self._sent_views.add(key)
+        return view
+
+    def _advertise(self, view, n, i):
+        '''
+        Puts the entry for destination i in the view for the neighbor n, as the protocol advertises it to n
+        :param view: distance vector
+        :param n: int, or None for the view shared by every neighbor
+        :param i: int
+        :return: None
+        '''
+        entry = self._distance_vector[i]
+        if (n is None or entry.next_hop != n):
+            view[i] = entry
+        elif (self.protocol == SPLIT_HORIZON_PROTOCOL):
+            view.pop(i, None)
+        else:
+            view[i] = UNREACHABLE
+
+    def _patch_views(self, destinations):
+        '''
+        Brings the views up to date after the entries for destinations changed
+        :param destinations: [int...]
+        :return: None
+        '''
+        for n in list(self._views):
+            view = self._views[n]
+            if (n in self._sent_views):
+                view = self._views[n] = dict(view)
+                self._sent_views.discard(n)
+            for i in destinations:
+                self._advertise(view, n, i)
+
+    def _drop_views(self):
+        '''
+        Forgets all views, they are built again the next time they are needed
+        :return: None
+        '''
+        self._views = {}
+        self._sent_views = set()
 
     def set_neighbor(self, neighbor, cost):
         '''
@@ -43,11 +90,17 @@ class RoutingTable:
         '''
         if (cost == -1):
             if (self._neighbors.get(neighbor) is not None):
-                del self._table[neighbor]
+                del self._neighbors[neighbor]
+                self._neighbor_order.remove(neighbor)
+                self._table.pop(neighbor, None)
+                self._views.pop(neighbor, None)
+                self._sent_views.discard(neighbor)
         else:
             if (self._neighbors.get(neighbor) is None):
                 self._table[neighbor] = {}
                 self._distance_vector[neighbor] = VectorEntry()
+                insort(self._neighbor_order, neighbor)
+                self._patch_views((neighbor,))
             self._neighbors[neighbor] = cost
 
     def set_neighbor_vector(self, n, distance_vector):
@@ -59,28 +112,86 @@ class RoutingTable:
         '''
         self._table[n] = distance_vector
 
-    def update_distance_vector(self):
+    def replace_neighbor_vector(self, n, distance_vector):
         '''
-        Recalculates the distance vector of this routing table based on available information
-        :return: None
+        Records the distance vector sent over by a neighbor, n, like set_neighbor_vector, and tells which destinations
+        it changed compared to the vector that neighbor sent before
+        :param n: int
+        :param distance_vector: distance vector
+        :return: [int...] - the destinations whose entry changed
         '''
-        for i in self._distance_vector:
-            if (i is self._router_num):
+        old = self._table.get(n) or {}
+        self._table[n] = distance_vector
+        if (old is distance_vector):
+            return []
+        changed = []
+        for i in range(1, self._N + 1):
+            a, b = old.get(i), distance_vector.get(i)
+            if (a is not b and (a is None or b is None or a != b)):
+                changed.append(i)
+        return changed
+
+    def update_distance_vector(self, destinations=None):
+        '''
+        Recalculates the distance vector of this routing table based on available information. If destinations is
+        given, only the entries for those destinations are recalculated.
+        :param destinations: [int...] or None for every destination
+        :return: [int...] - the destinations whose entry changed
+        '''
+        if (destinations is None):
+            destinations = self._distance_vector
+        changed = []
+        for i in destinations:
+            if (i == self._router_num):
                 continue
 
-            possible_entries = []
-            for n in self._neighbors:
-                if (self.get_cost(n, i) != -1):
-                    possible_entries.append(VectorEntry(next_hop=n, cost=self._neighbors[n] + self.get_cost(n, i),
-                                                        hops= 1 + self.get_hops(n,i)))
+            # Keep the cheapest route; ties go to the first (lowest) neighbor
+            cost, next_hop, hops = -1, -1, -1
+            for n in self._neighbor_order:
+                vector = self._table.get(n)
+                entry = vector.get(i) if (vector is not None) else None
+                if (entry is None or entry.cost == -1):
+                    continue
+                if (next_hop == -1 or self._neighbors[n] + entry.cost < cost):
+                    cost, next_hop, hops = self._neighbors[n] + entry.cost, n, entry.hops + 1
+
+            if (next_hop == i):
+                hops = 1
+                cost = self._neighbors[i]
+
+            # Entries are never modified in place since neighbors hold on to them, a changed entry is a new object
+            old_entry = self._distance_vector[i]
+            if (old_entry.cost != cost or old_entry.next_hop != next_hop or old_entry.hops != hops):
+                self._distance_vector[i] = VectorEntry(cost=cost, next_hop=next_hop, hops=hops)
+                changed.append(i)
+        if (len(changed)):
+            self._patch_views(changed)
+        return changed
+
+    def get_entries(self):
+        '''
+        Returns the entries of the distance vector, for destinations 1 to N
+        :return: [VectorEntry...]
+        '''
+        return [self._distance_vector[i] for i in range(1, self._N + 1)]
+
+    def get_entry(self, destination):
+        '''
+        Returns the entry of the distance vector for destination
+        :param destination: int
+        :return: VectorEntry
+        '''
+        return self._distance_vector[destination]
 
-            if (len(possible_entries)):
-                self._distance_vector[i] = min(possible_entries)
-                if self._distance_vector[i].next_hop == i:
-                    self._distance_vector[i].hops = 1
-                    self._distance_vector[i].cost = self._neighbors[i]
-            else:
-                self._distance_vector[i] = VectorEntry()
+    def set_entries(self, entries):
+        '''
+        Replaces the entries of the distance vector, e.g. when restoring a checkpoint
+        :param entries: [VectorEntry...] - for destinations 1 to N
+        :return: None
+        '''
+        for i, entry in enumerate(entries, 1):
+            self._distance_vector[i] = entry
+        self._drop_views()
 
     def get_cost(self, src, dst):
         '''
@@ -108,12 +219,12 @@ class RoutingTable:
 
 
     def __str__(self):
-        s = str(self._router_num) + '\t'
-        for i in range(1,self._N+1):
-            s += '%s,%s \t' % (self._distance_vector[i].next_hop, self._distance_vector[i].hops)
-        return s
+        entries = self.get_entries()
+        return format_row(self._router_num, [e.next_hop for e in entries], [e.hops for e in entries])
+
+class VectorEntry(object):
+    __slots__ = ('cost', 'next_hop', 'hops')
 
-class VectorEntry:
     def __init__(self, cost=-1, next_hop=-1, hops =-1):
         self.cost = cost
         self.next_hop = next_hop
@@ -130,3 +241,9 @@ class VectorEntry:
 
     def __eq__(self, other):
         return self.cost == other.cost and self.next_hop == other.next_hop and self.hops == other.hops
+
+    def __ne__(self, other):
+        return not self == other
+
+# Entry of a destination that can not be reached. Entries are never modified in place, so one can be shared.
+UNREACHABLE = VectorEntry()
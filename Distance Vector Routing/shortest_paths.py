@@ -0,0 +1,106 @@
+'''
+Shortest path oracle: the routing tables a network converges to, computed directly from its topology with Dijkstra's
+algorithm instead of by simulating rounds.
+
+With positive link costs a converged network has exactly one possible state, whatever the protocol: every router has
+the cheapest route to each destination it can reach, through its lowest numbered neighbor on such a route (the tie
+breaking of RoutingTable), with the hop count of the route its next hops make up. Destinations it can not reach have
+no route. So the oracle can check the final tables of a simulation (check_routes), and can stand in for the rounds a
+network spends converging before its first event (warm_start_network).
+'''
+from array import array
+from heapq import heappush, heappop
+
+
+def shortest_paths(topology):
+    '''
+    Computes the converged routing tables of a topology, in the layout of Network._get_vectors
+    :param topology: Topology
+    :return: tuple - (cost, next hop, hops) as array('l'), array('i'), array('i'), -1 for unreachable destinations
+    '''
+    N = topology.N
+    neighbors = [None] + [topology.neighbors(i) for i in range(1, N + 1)]
+    cost = array('l', [-1]) * (N * N)
+    next_hop = array('i', [-1]) * (N * N)
+    hops = array('i', [-1]) * (N * N)
+    for d in range(1, N + 1):
+        # Dijkstra from the destination, links are the same both ways
+        dist = {d: 0}
+        settled = []
+        heap = [(0, d)]
+        while (len(heap)):
+            c, i = heappop(heap)
+            if (c > dist[i]):
+                continue
+            settled.append(i)
+            for n, link_cost in neighbors[i]:
+                if (n not in dist or c + link_cost < dist[n]):
+                    dist[n] = c + link_cost
+                    heappush(heap, (c + link_cost, n))
+
+        # Routers are settled in order of their cost, so a router's next hop is always settled before it
+        for i in settled:
+            pos = (i - 1) * N + d - 1
+            cost[pos] = dist[i]
+            if (i == d):
+                next_hop[pos] = d
+                hops[pos] = 0
+                continue
+            for n, link_cost in neighbors[i]:
+                if (dist.get(n) is not None and link_cost + dist[n] == dist[i]):
+                    next_hop[pos] = n
+                    hops[pos] = hops[(n - 1) * N + d - 1] + 1
+                    break
+    return cost, next_hop, hops
+
+
+def convergence_round(hops):
+    '''
+    Returns the round a network starting from scratch converges in, i.e. the first round in which no router changes,
+    given its converged hop counts. A route of h hops is settled in round h, once the router at each hop has settled
+    its own.
+    :param hops: array - the hops of shortest_paths
+    :return: int
+    '''
+    return max(hops) + 1 if len(hops) else 1
+
+
+def check_routes(network):
+    '''
+    Compares the routing tables of a converged network with the shortest paths of its current topology
+    :param network: Network
+    :return: [(int, int, tuple, tuple)...] - (router, destination, (cost, next hop, hops) of the shortest path, the
+    same for the network) for every route that differs. Empty if they all match.
+    '''
+    N = network.N
+    expected = shortest_paths(network.topology)
+    actual = network._get_vectors()
+    errors = []
+    for pos in range(N * N):
+        want = (expected[0][pos], expected[1][pos], expected[2][pos])
+        got = (actual[0][pos], actual[1][pos], actual[2][pos])
+        if (want != got):
+            errors.append((pos // N + 1, pos % N + 1, want, got))
+    return errors
+
+
+def warm_start_network(network):
+    '''
+    Puts a network that has not simulated any rounds yet in the state it converges to, as of the round it converges
+    in, if its first event comes after that round. The details of the skipped rounds are not known, so this is never
+    done when detailed, nor for engines that do not support checkpoints.
+    :param network: Network
+    :return: boolean - whether the network was warm started
+    '''
+    if (network.round != 0 or network.detailed or not network.supports_checkpoints):
+        return False
+    cost, next_hop, hops = shortest_paths(network.topology)
+    rounds = convergence_round(hops)
+    first_event_time = network._events.peek_time()
+    if (first_event_time is not None and first_event_time <= rounds):
+        return False
+    network._set_vectors(cost, next_hop, hops)
+    network.round = rounds
+    network._converged = True
+    network._changed = {}
+    return True
@@ -0,0 +1,140 @@
+'''
+The simulator as a library, for running simulations in-process (on Python 2 or 3) instead of starting p3.py for every
+scenario:
+
+    from simulation import simulate
+    result = simulate('net.txt', 'events.txt', 'poison-reverse')
+    result.convergence_delay, result.routing_table(3), result.get_output()
+
+Topologies and events can be given as file names, open files or already loaded objects, so a topology that is
+simulated many times only has to be parsed once. Importing this module has no side effects and stays cheap: the
+matrix and partitioned engines (and with them numpy) are only imported when they are asked for.
+'''
+from event import Event, file_to_events
+from network import Network, protocol_num, protocol_str, simulate_protocol
+from topology import Topology, file_to_topology
+
+ENGINES = ('object', 'matrix', 'async', 'partitioned')
+
+
+def network_class(engine):
+    '''
+    Returns the network class of an engine
+    :param engine: str - one of ENGINES
+    :return: Network or a subclass of it
+    '''
+    if (engine == 'object'):
+        return Network
+    if (engine == 'matrix'):
+        from matrix_network import MatrixNetwork
+        return MatrixNetwork
+    if (engine == 'async'):
+        from async_network import AsyncNetwork
+        return AsyncNetwork
+    if (engine == 'partitioned'):
+        from partitioned_network import PartitionedNetwork
+        return PartitionedNetwork
+    raise ValueError('unknown engine: ' + str(engine))
+
+
+def load_topology(topology):
+    '''
+    Turns a topology file (by name or as an open file) into a Topology. A Topology is returned as it is.
+    :param topology: Topology, str or file
+    :return: Topology
+    '''
+    if (isinstance(topology, Topology)):
+        return topology
+    if (hasattr(topology, 'read')):
+        return file_to_topology(topology)
+    with open(topology) as f:
+        return file_to_topology(f)
+
+
+def load_events(events):
+    '''
+    Turns events given as a file (by name or as an open file) or as (time, router, router, cost) tuples into a list of
+    Events. Events are kept as they are.
+    :param events: str, file or iterable of Event or tuples, or None for no events
+    :return: [Event...]
+    '''
+    if (events is None):
+        return []
+    if (hasattr(events, 'read')):
+        return file_to_events(events)
+    if (isinstance(events, (str, type(u'')))):
+        with open(events) as f:
+            return file_to_events(f)
+    return [e if isinstance(e, Event) else Event(e) for e in events]
+
+
+class SimulationResult(object):
+    '''
+    The outcome of simulating one protocol. The final routing tables are kept as flat arrays indexed by
+    (router - 1) * N + (destination - 1), like Network._get_vectors, and the simulated network itself is kept in
+    network for anything else.
+    '''
+    def __init__(self, network):
+        self.network = network
+        self.N = network.N
+        self.protocol = network.protocol
+        self.protocol_name = protocol_str[network.protocol]
+        self.rounds = network.rounds
+        self.count_to_infinity_error = network.count_to_infinity_error
+        self.count_to_infinity_routes = network.count_to_infinity_routes
+        # None when the network counted to infinity and so never converged
+        self.convergence_delay = None if network.count_to_infinity_error else int(network.convergence_delay)
+        self.route_errors = network.route_errors
+        self.cost, self.next_hop, self.hops = network._get_vectors()
+
+    def route(self, router, destination):
+        '''
+        Returns the final route of router to destination
+        :param router: int
+        :param destination: int
+        :return: (int, int, int) - cost, next hop and hops, all -1 if destination can not be reached
+        '''
+        pos = (router - 1) * self.N + destination - 1
+        return self.cost[pos], self.next_hop[pos], self.hops[pos]
+
+    def routing_table(self, router):
+        '''
+        Returns the final routing table of router
+        :param router: int
+        :return: [(int, int, int)...] - the route to destinations 1 to N
+        '''
+        return [self.route(router, d) for d in range(1, self.N + 1)]
+
+    def get_output(self):
+        '''
+        Returns the final output in the format of output.txt (without the name of the protocol)
+        :return: str
+        '''
+        return self.network.get_output()
+
+    @property
+    def details(self):
+        '''
+        The detailed output, if the simulation was detailed
+        :return: str
+        '''
+        return self.network.details
+
+
+def simulate(topology, events=None, protocol=0, engine='object', detailed=False, cache=None, **network_options):
+    '''
+    Simulates one protocol on a topology with the given events, in this process.
+    :param topology: Topology, or a topology file by name or as an open file (see load_topology)
+    :param events: events file by name or as an open file, or an iterable of Event or (time, router, router, cost)
+    tuples, or None for no events (see load_events)
+    :param protocol: int or str - number or name (see PROTOCOL_NAMES in network.py) of the protocol
+    :param engine: str - one of ENGINES
+    :param detailed: boolean - whether to keep the detailed output
+    :param cache: ConvergedStateCache
+    :param network_options: extra keyword arguments for the network, e.g. incremental, round_budget, warm_start or
+    validate (see Network)
+    :return: SimulationResult
+    '''
+    network = simulate_protocol(network_class(engine), load_topology(topology), load_events(events),
+                                protocol_num(protocol), detailed, network_options, cache)
+    return SimulationResult(network)
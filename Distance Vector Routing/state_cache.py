@@ -0,0 +1,133 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+from checkpoint import load_checkpoint, save_checkpoint
+from hooks import NetworkHook
+
+
+class ConvergedStateCache(object):
+    '''
+    An on-disk cache of the state a topology converges to when no events happen, for each protocol. The states are
+    checkpoints (see checkpoint.py) named after a hash of the topology and protocol and the round the network
+    converged in. A simulation whose first event comes after that round would go through exactly the same rounds up
+    to it, so it can start from the cached state instead and still number its rounds the same.
+
+    The cache is kept under max_bytes by removing the least recently used states. Several processes can share a cache
+    directory, states are written to a temporary file and then renamed into place.
+    '''
+    def __init__(self, directory, max_bytes=256 << 20):
+        '''
+        :param directory: str - created if it does not exist
+        :param max_bytes: int - size the cache is kept under
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if (not os.path.isdir(directory)):
+            os.makedirs(directory)
+
+    def _key(self, topology, protocol):
+        return hashlib.sha256((topology.digest() + ':' + str(protocol)).encode()).hexdigest()
+
+    def lookup(self, topology, protocol):
+        '''
+        Finds the converged state of topology under protocol
+        :param topology: Topology
+        :param protocol: int
+        :return: (str, int) - the checkpoint file and the round the network converged in, or None if not cached
+        '''
+        for file_name in glob.glob(os.path.join(self.directory, self._key(topology, protocol) + '-*.ckpt')):
+            try:
+                rounds = int(file_name[:-len('.ckpt')].rsplit('-', 1)[1])
+                # Marks the state as recently used
+                os.utime(file_name, None)
+            except (ValueError, OSError):
+                continue
+            return file_name, rounds
+        return None
+
+    def load(self, topology, protocol, first_event_time, network_class, detailed, network_options=None):
+        '''
+        Restores the converged state of topology under protocol, if it is cached and the first event comes after the
+        network converged. The details of the skipped rounds are not in the cache, so it is never used when detailed,
+        nor for engines that do not support checkpoints.
+        :param topology: Topology
+        :param protocol: int
+        :param first_event_time: int or None if there are no events
+        :param network_class: Network or a subclass of it
+        :param detailed: boolean
+        :param network_options: dict - extra keyword arguments for network_class
+        :return: Network or None
+        '''
+        if (detailed or not network_class.supports_checkpoints):
+            return None
+        found = self.lookup(topology, protocol)
+        if (found is None or (first_event_time is not None and first_event_time <= found[1])):
+            return None
+        try:
+            return load_checkpoint(found[0], network_class, detailed, **(network_options or {}))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def store(self, network):
+        '''
+        Adds the state of a network that has converged without any events to the cache
+        :param network: Network
+        :return: None
+        '''
+        file_name = os.path.join(self.directory, '%s-%d.ckpt' % (self._key(network.topology, network.protocol),
+                                                                 network.round))
+        fd, temp_file_name = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        try:
+            save_checkpoint(network, temp_file_name, include_events=False)
+            os.rename(temp_file_name, file_name)
+        except:
+            os.remove(temp_file_name)
+            raise
+        self._evict()
+
+    def _evict(self):
+        '''
+        Removes the least recently used states until the cache fits in max_bytes
+        :return: None
+        '''
+        entries = []
+        for file_name in glob.glob(os.path.join(self.directory, '*.ckpt')):
+            try:
+                stat = os.stat(file_name)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_name in sorted(entries):
+            if (total <= self.max_bytes):
+                break
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+            total -= size
+
+    def hook(self):
+        '''
+        Returns a hook that stores the state of the network it is added to in the cache once it has converged, if
+        that happened before its first event
+        :return: NetworkHook
+        '''
+        return _StoreConvergedState(self)
+
+
+class _StoreConvergedState(NetworkHook):
+    def __init__(self, cache):
+        self.cache = cache
+        self.stored = False
+
+    def round_end(self, network, t, stats):
+        if (self.stored or network._last_event_time != 0 or not network._converged):
+            return
+        self.stored = True
+        next_time = network._events.peek_time()
+        if (next_time is None or next_time > t):
+            self.cache.store(network)
@@ -0,0 +1,48 @@
+'''
+Regression tests of the async engine: python -m unittest test_async_network
+'''
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from simulation import simulate
+
+# Link 1-3 comes up at 15, 1-4 goes from cost 7 to 24 at 20 and back down to 8 at 27 (the events on 1-5 and 2-5 are for
+# links that do not exist). With latency = cost, the vectors sent over 1-4 at 27 would arrive before the ones sent
+# at 20, which are still in flight, and then be overwritten by them
+TOPOLOGY = "5\n1 2 9\n4 5 9\n1 4 7\n"
+EVENTS = [(5, 1, 5, -1), (12, 5, 2, -1), (15, 3, 1, 18), (20, 4, 1, 24), (27, 1, 4, 8)]
+
+
+def latency_is_cost(n1, n2, cost):
+    return cost
+
+
+class LatencyDecreaseTest(unittest.TestCase):
+    def simulate(self, protocol, engine, **network_options):
+        return simulate(StringIO(TOPOLOGY), EVENTS, protocol, engine, round_budget=5000, validate=True,
+                        **network_options)
+
+    def test_older_vectors_do_not_overtake_newer_ones(self):
+        for protocol in range(3):
+            result = self.simulate(protocol, 'async', latency=latency_is_cost)
+            self.assertEqual(result.route_errors, [])
+            self.assertEqual(result.route(4, 3), (26, 1, 2))
+            self.assertEqual(result.route(5, 3), (35, 4, 3))
+
+    def test_same_tables_as_the_object_engine(self):
+        for protocol in range(3):
+            expected = self.simulate(protocol, 'object')
+            result = self.simulate(protocol, 'async', latency=latency_is_cost)
+            for router in range(1, 6):
+                self.assertEqual(result.routing_table(router), expected.routing_table(router))
+
+    def test_count_to_infinity_detector_is_rejected(self):
+        self.assertRaises(ValueError, self.simulate, 0, 'async', detect_count_to_infinity=True)
+
+
+if (__name__ == '__main__'):
+    unittest.main()
@@ -0,0 +1,49 @@
+'''
+Regression tests of checkpoints: python -m unittest test_checkpoint
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from checkpoint import CheckpointHook, load_checkpoint
+from simulation import simulate
+
+# Router 4 is cut off in round 4, and the others count to infinity to it through the 1-3 link
+TOPOLOGY = "4\n1 2 1\n2 3 1\n3 4 1\n1 3 5\n"
+EVENTS = [(4, 3, 4, -1)]
+
+
+class CountToInfinityResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_resume_partway_through_a_count_to_infinity(self):
+        file_name = os.path.join(self.directory, 'run-{protocol}-{round}.ckpt')
+        for protocol in range(3):
+            expected = simulate(StringIO(TOPOLOGY), EVENTS, protocol, detect_count_to_infinity=True,
+                                hooks=[CheckpointHook(file_name, rounds=(5,))])
+            network = load_checkpoint(file_name.format(protocol=protocol, round=5), detect_count_to_infinity=True)
+            network.simulate()
+            self.assertEqual(network.rounds, expected.rounds)
+            self.assertEqual(network.count_to_infinity_error, expected.count_to_infinity_error)
+            self.assertEqual(network.count_to_infinity_routes, expected.count_to_infinity_routes)
+            self.assertEqual(network._get_vectors(), (expected.cost, expected.next_hop, expected.hops))
+
+    def test_no_detector_state_to_resume_from(self):
+        file_name = os.path.join(self.directory, 'run-{protocol}-{round}.ckpt')
+        simulate(StringIO(TOPOLOGY), EVENTS, 0, hooks=[CheckpointHook(file_name, rounds=(5,))])
+        self.assertRaises(ValueError, load_checkpoint, file_name.format(protocol=0, round=5),
+                          detect_count_to_infinity=True)
+
+
+if (__name__ == '__main__'):
+    unittest.main()
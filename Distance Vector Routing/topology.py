@@ -0,0 +1,242 @@
+from array import array
+from bisect import bisect_left
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+# Binary topology files: a header (magic, N, number of link slots) followed by the compressed sparse rows of a Topology
+# (indptr, indices, costs), all as little endian 64 bit integers.
+BINARY_TOPOLOGY_MAGIC = b'DVTOPO01'
+_BINARY_TOPOLOGY_HEADER = struct.Struct('<8sqq')
+
+
+class Topology(object):
+    '''
+    This class holds the links of the network as compressed sparse rows. For router r (1 to N) the neighbors are
+    indices[indptr[r]:indptr[r + 1]], sorted in ascending order, and the matching link costs are at the same positions
+    in costs. Every link is stored in both directions. A removed link keeps its slot with a cost of -1 so that a link
+    that flaps down and back up again is updated in place.
+    '''
+    def __init__(self, N, links=()):
+        '''
+        :param N: int - number of routers
+        :param links: iterable of (n1, n2, cost) tuples. Later links override earlier ones, a cost of -1 means no link.
+        '''
+        self.N = N
+        last_cost = {}
+        for n1, n2, cost in links:
+            if (n1 != n2):
+                last_cost[(min(n1, n2), max(n1, n2))] = cost
+
+        rows = [[] for _ in range(N + 1)]
+        for (n1, n2), cost in last_cost.items():
+            if (cost != -1):
+                rows[n1].append((n2, cost))
+                rows[n2].append((n1, cost))
+
+        self.indptr = array('l', [0, 0])
+        self.indices = array('l')
+        self.costs = array('l')
+        for r in range(1, N + 1):
+            for n, cost in sorted(rows[r]):
+                self.indices.append(n)
+                self.costs.append(cost)
+            self.indptr.append(len(self.indices))
+
+    def _find(self, n1, n2):
+        '''
+        Returns the position of n2 in the row of n1, or -1 if the two have never been linked
+        :param n1: int
+        :param n2: int
+        :return: int
+        '''
+        lo, hi = self.indptr[n1], self.indptr[n1 + 1]
+        pos = bisect_left(self.indices, n2, lo, hi)
+        if (pos < hi and self.indices[pos] == n2):
+            return pos
+        return -1
+
+    def neighbors(self, router_num):
+        '''
+        Returns the (neighbor, cost) pairs of every link of router_num, in ascending neighbor order
+        :param router_num: int
+        :return: [(int, int)...]
+        '''
+        lo, hi = self.indptr[router_num], self.indptr[router_num + 1]
+        return [(self.indices[i], self.costs[i]) for i in range(lo, hi) if self.costs[i] != -1]
+
+    def get_cost(self, n1, n2):
+        '''
+        Returns the cost of the link between n1 and n2, or -1 if there is no such link
+        :param n1: int
+        :param n2: int
+        :return: int
+        '''
+        pos = self._find(n1, n2)
+        return self.costs[pos] if pos != -1 else -1
+
+    def set_cost(self, n1, n2, cost):
+        '''
+        Sets the cost of the link between n1 and n2 in both directions. A cost of -1 removes the link.
+        :param n1: int
+        :param n2: int
+        :param cost: int
+        :return: None
+        '''
+        if (n1 == n2):
+            return
+        for a, b in ((n1, n2), (n2, n1)):
+            pos = self._find(a, b)
+            if (pos != -1):
+                self.costs[pos] = cost
+            elif (cost != -1):
+                pos = bisect_left(self.indices, b, self.indptr[a], self.indptr[a + 1])
+                self.indices.insert(pos, b)
+                self.costs.insert(pos, cost)
+                for r in range(a + 1, self.N + 2):
+                    self.indptr[r] += 1
+
+    def components(self):
+        '''
+        Returns the connected components of the network, each as a list of router numbers in ascending order. The
+        components are in order of their lowest router.
+        :return: [[int...]...]
+        '''
+        component_of = [0] * (self.N + 1)
+        components = []
+        for r in range(1, self.N + 1):
+            if (component_of[r]):
+                continue
+            component_of[r] = r
+            members = [r]
+            for m in members:
+                for n, cost in self.neighbors(m):
+                    if (not component_of[n]):
+                        component_of[n] = r
+                        members.append(n)
+            components.append(sorted(members))
+        return components
+
+    def digest(self):
+        '''
+        Returns a hash of the routers and links of the network. Two topologies with the same links have the same
+        digest, no matter how they were built.
+        :return: str - hex digest
+        '''
+        h = hashlib.sha256(str(self.N).encode())
+        for r in range(1, self.N + 1):
+            h.update((';' + ','.join('%d:%d' % link for link in self.neighbors(r))).encode())
+        return h.hexdigest()
+
+    def copy(self):
+        '''
+        Returns an independent copy of this topology
+        :return: Topology
+        '''
+        t = Topology.__new__(Topology)
+        t.N = self.N
+        t.indptr = array('l', self.indptr)
+        t.indices = array('l', self.indices)
+        t.costs = array('l', self.costs)
+        return t
+
+
+def file_to_topology(file):
+    '''
+    Given a topology file, this will return a Topology. The first line holds the number of routers and every other
+    line holds a link: "<router> <router> <cost>". Binary topology files are recognized and loaded as well.
+    :param file: file
+    :return: Topology
+    '''
+    if (hasattr(file, 'name') and is_binary_topology(file.name)):
+        return load_binary_topology(file.name)
+    lines = file.read().splitlines()
+    N = int(lines[0])
+    links = []
+    for line in lines[1:]:
+        values = [int(x) for x in line.split(" ") if (len(x) > 0)]
+        if (len(values)):
+            links.append(values)
+    return Topology(N, links)
+
+
+def _int64_array(data):
+    '''
+    Turns little endian 64 bit integers into an array('l') with a single copy
+    :param data: bytes
+    :return: array
+    '''
+    typecode = 'l' if array('l').itemsize == 8 else 'q'
+    a = array(typecode)
+    if (hasattr(a, 'frombytes')):
+        a.frombytes(data)
+    else:
+        a.fromstring(data)
+    if (sys.byteorder == 'big'):
+        a.byteswap()
+    return a if typecode == 'l' else array('l', a)
+
+
+def _int64_bytes(a):
+    '''
+    Turns an array of integers into little endian 64 bit integers
+    :param a: array
+    :return: bytes
+    '''
+    if (a.itemsize != 8 or sys.byteorder == 'big'):
+        a = array('l' if array('l').itemsize == 8 else 'q', a)
+        if (sys.byteorder == 'big'):
+            a.byteswap()
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
+def is_binary_topology(file_name):
+    '''
+    Indicates whether the file is a binary topology file
+    :param file_name: str
+    :return: boolean
+    '''
+    if (not os.path.isfile(file_name)):
+        return False
+    with open(file_name, 'rb') as f:
+        return f.read(len(BINARY_TOPOLOGY_MAGIC)) == BINARY_TOPOLOGY_MAGIC
+
+
+def write_binary_topology(topology, file_name):
+    '''
+    Writes the topology to a binary topology file
+    :param topology: Topology
+    :param file_name: str
+    :return: None
+    '''
+    with open(file_name, 'wb') as f:
+        f.write(_BINARY_TOPOLOGY_HEADER.pack(BINARY_TOPOLOGY_MAGIC, topology.N, len(topology.indices)))
+        f.write(_int64_bytes(topology.indptr))
+        f.write(_int64_bytes(topology.indices))
+        f.write(_int64_bytes(topology.costs))
+
+
+def load_binary_topology(file_name):
+    '''
+    Loads a binary topology file. The file is memory mapped and each of the compressed sparse rows is copied into
+    its array in one go, nothing is parsed.
+    :param file_name: str
+    :return: Topology
+    '''
+    with open(file_name, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, N, slots = _BINARY_TOPOLOGY_HEADER.unpack_from(mm, 0)
+            if (magic != BINARY_TOPOLOGY_MAGIC):
+                raise ValueError(file_name + ' is not a binary topology file')
+            t = Topology.__new__(Topology)
+            t.N = N
+            start = _BINARY_TOPOLOGY_HEADER.size
+            for name, length in (('indptr', N + 2), ('indices', slots), ('costs', slots)):
+                setattr(t, name, _int64_array(mm[start:start + 8 * length]))
+                start += 8 * length
+        finally:
+            mm.close()
+    return t
@@ -0,0 +1,109 @@
+'''
+Adapting a connection to its path: the retransmission timeout, estimated from the round trip times of acknowledged
+packets, and the congestion window, which limits the packets in flight to what the path seems able to carry.
+'''
+
+# Gains of the smoothed round trip time and of its variation, and the weight of the variation in the timeout
+# (Jacobson/Karels, as in RFC 6298)
+RTT_ALPHA = 1.0 / 8
+RTT_BETA  = 1.0 / 4
+RTT_K     = 4
+
+# Bounds of the retransmission timeout, in seconds
+MIN_RTO = 0.2
+MAX_RTO = 60.0
+
+
+class RtoEstimator( object ):
+    '''
+    Retransmission timeout of a connection. Until the first round trip time is measured it is the initial timeout,
+    after that it is srtt + K * rttvar. A timeout doubles it (exponential backoff) until a new round trip time is
+    measured, once for all the packets that were in flight at the time. Only packets that were not retransmitted are
+    measured (Karn's algorithm), as the ack of a retransmitted packet could be the ack of any of its copies.
+    '''
+    def __init__( self, initial_rto ):
+        '''
+        :param initial_rto: float - seconds, the timeout before any round trip time is known
+        '''
+        self.srtt   = None
+        self.rttvar = None
+        self.rto    = initial_rto
+
+        # When the timeout was last backed off
+        self.backed_off = None
+
+    def sample( self, rtt ):
+        '''
+        Takes the round trip time of a packet into account
+        :param rtt: float - seconds between sending a packet (once) and receiving its ack
+        :return: None
+        '''
+        if self.srtt is None:
+            self.srtt   = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = ( 1 - RTT_BETA ) * self.rttvar + RTT_BETA * abs( self.srtt - rtt )
+            self.srtt   = ( 1 - RTT_ALPHA ) * self.srtt + RTT_ALPHA * rtt
+
+        self.rto = min( max( self.srtt + RTT_K * self.rttvar, MIN_RTO ), MAX_RTO )
+
+    def timed_out( self, sent, now ):
+        '''
+        Backs the timeout off after a packet timed out, unless it was sent before the last backoff
+        :param sent: float - when the packet was last sent
+        :param now: float - the current time
+        :return: None
+        '''
+        if self.backed_off is not None and sent < self.backed_off:
+            return
+
+        self.rto        = min( self.rto * 2, MAX_RTO )
+        self.backed_off = now
+
+
+class CongestionWindow( object ):
+    '''
+    AIMD congestion window, in packets. It starts at one packet and grows by one packet for every acked packet (slow
+    start) up to ssthresh, then by one packet per window of acked packets (additive increase). A timeout halves
+    ssthresh and restarts slow start from one packet (multiplicative decrease), at most once per window of packets:
+    timeouts of packets that were sent before the last decrease are the same loss.
+    '''
+    def __init__( self, ssthresh=64 ):
+        '''
+        :param ssthresh: float - packets, where slow start ends until the first loss
+        '''
+        self.cwnd     = 1.0
+        self.ssthresh = float( ssthresh )
+        # Packets sent before this sequence number were in flight at the last decrease
+        self.recover  = -1
+
+    def allowed( self ):
+        '''
+        :return: int - the packets that may be in flight
+        '''
+        return max( int( self.cwnd ), 1 )
+
+    def acked( self ):
+        '''
+        Grows the window for a newly acked packet
+        :return: None
+        '''
+        if self.cwnd < self.ssthresh:
+            self.cwnd += 1
+        else:
+            self.cwnd += 1 / self.cwnd
+
+    def timed_out( self, seq_num, in_flight, next_seq_num ):
+        '''
+        Shrinks the window after a packet timed out
+        :param seq_num: int - sequence number of the packet
+        :param in_flight: int - packets waiting for an ack
+        :param next_seq_num: int - the sequence number of the next packet to be sent
+        :return: None
+        '''
+        if seq_num < self.recover:
+            return
+
+        self.ssthresh = max( in_flight / 2.0, 2.0 )
+        self.cwnd     = 1.0
+        self.recover  = next_seq_num
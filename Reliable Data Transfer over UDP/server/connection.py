@@ -0,0 +1,521 @@
+from __future__ import print_function
+
+import collections
+
+from packet import PacketIterator, Packet, ACK, SYNACK, SACK, CLOSEACK, CLOSE, EODACK, EOD_FLAG, RETRANSMIT_FLAG, \
+    construct_packet, sack_seq_nums, NUDGE_FLAG
+from timers import RetransmissionTimers, NUDGE, clock
+from congestion import RtoEstimator, CongestionWindow
+
+# Seconds an ack of data received in order may be held back for, so it can be combined with the acks of the packets
+# after it (cumulative acks only)
+ACK_DELAY = 0.2
+
+
+class ReldatConnection( object ):
+    '''
+    The state of the server's connection with a single client: the handshake and teardown, the receive buffer, the
+    sequence numbers and the timers of the packets waiting to be acknowledged. The server (see reldat.py) keeps one
+    of these per client address and hands it every packet that comes from that address.
+    '''
+    def __init__( self, server, address ):
+        '''
+        :param server: Reldat - the server the connection belongs to, whose out socket, port, window size and timeouts
+        the connection uses
+        :param address: (str, int) - the address the client's packets come from
+        '''
+        self.server  = server
+        self.address = address
+
+        # Packets for the client go to the port the server listens on, at the client's ip address
+        self.dst_ip_address      = None
+        self.dst_max_window_size = None
+        self.on_handshake        = 0
+        self.on_teardown         = 0
+
+        # Set once the connection is over, the server then forgets it
+        self.closed = False
+
+        # Need to ACK
+        self.seqs_recd = []
+
+        # Waiting for ACK
+        self.seqs_sent = []
+        self.timers    = RetransmissionTimers(self.server.timeout)
+
+        # Retransmission timeout estimated from round trip times, congestion window, and packets resent so far
+        self.rtt             = RtoEstimator(self.server.timeout)
+        self.congestion      = CongestionWindow()
+        self.retransmissions = 0
+
+        # Packets of data waiting for room in the client's window, they are sent as acks come in
+        self.send_queue = collections.deque()
+
+        # Whether the client asked for cumulative acks (see SACK in packet.py), the next sequence number expected from
+        # the client, the ones above it that were received, and the packets received in order that are not acked yet
+        self.sack         = False
+        self.recv_next    = 0
+        self.recv_ahead   = set()
+        self.acks_owed    = 0
+        self.ack_deadline = None
+
+        self.pkt_buffer = [None for _ in range(self.server.src_max_window_size)]
+
+        self.on_seq = 0
+        self.eod_recd = False
+
+        self.last_recieved = clock()
+
+        # Sequence number the receive buffer starts at, and the data received for the current transformation
+        self.ind_start = 0
+        self.all_data  = b""
+
+    def log( self, message ):
+        '''
+        Prints a message about this connection, prefixed with the client's address
+        :param message: str
+        :return: None
+        '''
+        print( '[' + str( self.address[0] ) + ':' + str( self.address[1] ) + '] ' + message )
+
+    def receive( self, packet ):
+        '''
+        Handles a packet that came from the client.
+        :param packet: Packet
+        :return: None
+        '''
+        self.last_recieved = clock()
+
+        if not self.has_connection():
+            self.establish_connection( packet )
+        elif packet.is_close():
+            self.disconnect(packet)
+        elif packet.is_data():
+            self.handle_data(packet)
+        elif packet.is_ack():
+            self.handle_ack(packet)
+        elif packet.is_eod():
+            self.handle_eod(packet)
+
+    def send_ack(self, packet, eod=False):
+        '''
+        Send an ack for the passed in packet. Ack will contain the correct sequence num. If the client asked for
+        cumulative acks, the packet is acked with those instead (see ack_cumulative).
+        :param packet: Packet
+        :param eod: boolean - indicates whether the packet being acked had the eod flag set
+        :return: None
+        '''
+        if self.sack:
+            self.ack_cumulative(packet, eod)
+            return
+
+        if eod:
+            self.log('Acknowledging EOD.')
+            ack_pkt = EODACK(packet.seq_num)
+        else:
+            self.log('Acknowledging received SEQ ' + str(packet.seq_num) + '.')
+            ack_pkt = ACK(packet.seq_num)
+
+        self.server.out_socket.sendto(ack_pkt, self.dst_ip_address)
+
+    def ack_cumulative(self, packet, eod=False):
+        '''
+        Records a packet as received and acks it with a cumulative ack. Packets received in order are acked together,
+        once half of the server's window (which is what the client may have in flight) is owed an ack or ACK_DELAY
+        has passed. Packets received out of order, packets that fill a gap, duplicates and the eod are acked right
+        away, so the client learns of gaps, of their repair and of lost acks quickly.
+        :param packet: Packet
+        :param eod: boolean - indicates whether the packet being acked had the eod flag set
+        :return: None
+        '''
+        seq_num   = packet.seq_num
+        duplicate = seq_num < self.recv_next or seq_num in self.recv_ahead
+        had_gap   = bool(self.recv_ahead)
+
+        if not duplicate:
+            self.recv_ahead.add(seq_num)
+            while self.recv_next in self.recv_ahead:
+                self.recv_ahead.remove(self.recv_next)
+                self.recv_next += 1
+
+        self.acks_owed += 1
+        half_window = max(1, self.server.src_max_window_size // 2)
+        if eod or duplicate or had_gap or self.recv_ahead or self.acks_owed >= half_window:
+            self.flush_ack(eod)
+        elif self.ack_deadline is None:
+            self._delay_ack()
+
+    def flush_ack(self, eod=False):
+        '''
+        Sends a cumulative ack for everything received so far.
+        :param eod: boolean - indicates whether the last packet received had the eod flag set
+        :return: None
+        '''
+        if eod:
+            self.log('Acknowledging EOD.')
+        else:
+            self.log('Acknowledging received data up to SEQ ' + str(self.recv_next - 1) + '.')
+
+        self.server.out_socket.sendto(SACK(self.recv_next, self.recv_ahead, eod), self.dst_ip_address)
+        self.acks_owed    = 0
+        self.ack_deadline = None
+
+    def _delay_ack(self):
+        '''
+        Holds back the ack of the packets received in order, until flush_ack is called by resend_packets after
+        ACK_DELAY (or earlier, by the packets after them).
+        :return: None
+        '''
+        self.ack_deadline = clock() + ACK_DELAY
+
+    def get_seq_num(self):
+        '''
+        increments and returns the correct sequence number to be used for the the next packet to be sent. Should only
+        be called once per sending a packet.
+        :return: int
+        '''
+        self.seqs_sent.append(self.on_seq)
+        self.on_seq += 1
+        return self.seqs_sent[-1]
+
+    def handle_data(self, packet):
+        '''
+            should be called when the packet.is_data() flag is set. Handles the data in the packet and sends back an ack
+            :param packet: Packet
+            :return:  None
+        '''
+        self.log('Received data.')
+
+        self.seqs_recd.append(packet.seq_num)
+
+        if self.is_buffer_full() and not packet.is_retransmit():
+            data = self.flush_buffer()
+            self.all_data += data
+            self.send(data)
+
+        window_size = self.server.src_max_window_size
+        if packet.seq_num - self.ind_start >= window_size:
+            self.ind_start += window_size
+            self.ind_start -= packet.seq_num % window_size
+
+        index = packet.seq_num - self.ind_start
+
+        if not packet.is_retransmit() or packet.seq_num not in self.seqs_recd:
+            self.pkt_buffer[index] = packet
+
+        self.send_ack(packet)
+
+    def handle_ack(self, packet):
+        '''
+        should be called if a packet's is_ack() flag is set. Stops the timer for the ack'd oacket
+        :param packet:
+        :return:
+        '''
+        self.log('Received acknowledgement.')
+
+        # If there is no timer, it means the client sent us an ACK
+        # for the same packet twice, possibly due to network
+        # delays. These can be ignored.
+        if packet.is_nudge():
+            self._stop_timer(NUDGE)
+        elif packet.is_sack():
+            # Everything before the ack number, and the packets after it in the bitmap
+            for seq_num in self.timers:
+                if 0 <= seq_num < packet.ack_num:
+                    self._stop_timer(seq_num)
+            for seq_num in sack_seq_nums(packet):
+                self._stop_timer(seq_num)
+        else:
+            self._stop_timer(packet.ack_num)
+
+        # Acks make room in the client's window
+        self._fill_window()
+
+        if not self.timers and not self.send_queue and self.is_buffer_empty() and self.eod_recd:
+            eod = construct_packet('', self.get_seq_num(), 0, [EOD_FLAG])
+            self._send_raw_packet(eod)
+            self.eod_recd = False
+
+    def handle_eod(self, packet):
+        '''
+        should be called if a packets is_eod() flag is set. sends the appropriate ack, flushes the buffer and sends back
+        the approriate response.
+        :param packet:
+        :return:
+        '''
+        self.log('Received all data from client.')
+
+        self.eod_recd = True
+        self.send_ack(packet, True)
+
+        data = self.flush_buffer()
+        self.all_data += data
+        self.send(data)
+
+        self.ind_start = 0
+        self.all_data = b""
+
+    def establish_connection( self, packet ):
+        '''
+        Handles every step of the establishing a connection. Should be called as long as has_connection() returns false
+        which for any connection setup will be twice: once for the Syn in which case this method will send back a SynAck,
+         and once for the last ack of establishing a connection. If this isn't called for those two times,
+         has_connection() will return false. Takes care of window size/and sequence number considerations.
+        :param packet: packet sent from client.
+        :return: None
+        '''
+        if self.on_handshake == 0:
+            if packet.is_open():
+                self.log('Attempting to establish connection on port ' + str( self.server.port ) + '...')
+
+                self.dst_ip_address      = ( self.address[0], self.server.port )
+                self.dst_max_window_size = int( packet.payload )
+
+                # A client that sets the sack flag gets cumulative acks, the data after the open request comes next
+                self.sack      = bool( packet.is_sack() )
+                self.recv_next = packet.seq_num + 1
+
+                synack = SYNACK(str(self.server.src_max_window_size), packet.seq_num, self.sack)
+                self._send_raw_packet(synack)
+                self.on_handshake = 1
+        elif self.on_handshake == 1:
+            if not packet.is_open():
+                if packet.is_ack():
+                    self._stop_timer(packet.ack_num)
+                    self.log('Connection established.')
+                    self.on_handshake = 2
+                    self.ind_start = 1
+
+    def check_connection(self):
+        '''
+        Sends a "NUDGE" packet to the client and sets a timer for it. The rest is handled by the default processes of
+        this protocol - if the client does not respond after 3 repeated nudges, the connection will be closed with the
+        assumption the client has crashed.
+        :return: None
+        '''
+        if self.has_connection() and clock() - self.last_recieved > self.server.timeout and len(self.timers) == 0:
+            self.log('Nudging client.')
+            self._send_raw_packet(construct_packet("", 0, 0, [NUDGE_FLAG]))
+
+    def next_deadline(self):
+        '''
+        returns when resend_packets has something to do next: a held back ack to send or a timer to run out.
+        :return: float - a time of clock, or None if there is nothing to wait for
+        '''
+        deadlines = [d for d in (self.ack_deadline, self.timers.next_deadline()) if d is not None]
+        return min(deadlines) if deadlines else None
+
+    def is_buffer_empty(self):
+        '''
+        indicates whether or not the buffer is empty.
+        :return: boolean
+        '''
+        for data in self.pkt_buffer:
+            if (data is not None):
+                return False
+
+        return True
+
+    def is_buffer_full(self):
+        '''
+        indicates whether or not the buffer is full
+        :return: boolean
+        '''
+        for data in self.pkt_buffer:
+            if (data is None):
+                return False
+
+        return True
+
+    def flush_buffer(self):
+        '''
+        clears the buffer and returns any data taht was inside it
+        :return: bytes
+        '''
+        buffered_data = b''
+
+        for pkt in self.pkt_buffer:
+            if (pkt is not None):
+                buffered_data += pkt.payload
+
+        self.pkt_buffer = [None for _ in range(self.server.src_max_window_size)]
+        return buffered_data
+
+    def resend_packets(self):
+        '''
+        Resends the unacked packets whose timers have run out (see _timer_ran_out). Only the timers that ran out are
+        looked at, not every packet waiting for an ack.
+        :return: None
+        '''
+        if self.ack_deadline is not None and clock() >= self.ack_deadline:
+            self.flush_ack()
+
+        for timer in self.timers.expired():
+            self._timer_ran_out(timer)
+            if self.closed:
+                return
+
+    def _timer_ran_out(self, timer):
+        '''
+        Resends a packet whose ack did not come in time, backing off the retransmission timeout and shrinking the
+        congestion window. Once the packet has been resent a max amount of times and give_up_time has passed since it
+        was first sent, this will close the connection with the assumption that the client has crashed.
+        :param timer: Timer
+        :return: None
+        '''
+        now = clock()
+        if timer.retransmissions >= self.server.max_retransmissions and \
+                now - timer.first_sent >= self.server.give_up_time:
+            self.log('Max retransmission count reached. Assuming client failure.')
+            self.close()
+            return
+
+        self.rtt.timed_out(timer.sent, now)
+        if timer.key != NUDGE:
+            self.congestion.timed_out(timer.key, self._in_flight(), self.on_seq)
+
+        self._send_raw_packet(timer.packet, True)
+
+    def send(self, data):
+        '''
+        Splits the data into packets and queues them to be sent, as many at a time as the client's window has room for
+        (see _fill_window)
+        :param data: bytes
+        :return: None
+        '''
+        packetizer = PacketIterator( data.upper(), self.dst_max_window_size, self.get_seq_num )
+
+        self.send_queue.extend(packetizer)
+        self._fill_window()
+
+    def _fill_window(self):
+        '''
+        Sends queued packets of data using _send_raw_packet while fewer packets than both the window the client
+        advertised in the handshake and the congestion window are waiting for an ack.
+        :return: None
+        '''
+        window = min(self.dst_max_window_size, self.congestion.allowed())
+        while self.send_queue and self._in_flight() < window:
+            self.log('Sending back data.')
+            self._send_raw_packet(self.send_queue.popleft())
+
+    def _in_flight(self):
+        '''
+        returns the number of packets waiting for an ack, not counting a nudge
+        :return: int
+        '''
+        return len(self.timers) - (NUDGE in self.timers)
+
+    def _send_raw_packet(self, packet, retransmit=False):
+        '''
+        This will send packet over the connected client and start a timer for recieving the ack.
+        :param packet:
+        :param retransmit:
+        :return:
+        '''
+        self.server.out_socket.sendto(packet, self.dst_ip_address)
+        sent = Packet(packet)
+
+        if retransmit:
+            sent.add_flag(RETRANSMIT_FLAG)
+            self.retransmissions += 1
+            self.log('Re-sending unacknowledged data.')
+
+        if sent.is_nudge():
+            seq_num = NUDGE
+        else:
+            seq_num = sent.seq_num
+
+        self._start_timer(seq_num, packet)
+
+    def _start_timer(self, seq_num, packet):
+        '''
+        Starts the timer for recieving the ack of a packet that was just sent, or restarts it if the packet was resent.
+        :param seq_num: int - sequence number of the packet, or NUDGE
+        :param packet: the packet as it was sent
+        :return: Timer
+        '''
+        return self.timers.start(seq_num, packet, timeout=self.rtt.rto)
+
+    def _stop_timer(self, seq_num):
+        '''
+        Stops the timer of a packet that has been acknowledged, measuring its round trip time if it was only sent once
+        and growing the congestion window. Does nothing if there is no such timer.
+        :param seq_num: int - sequence number of the packet, or NUDGE
+        :return: None
+        '''
+        timer = self.timers.stop(seq_num)
+        if timer is None:
+            return
+
+        if timer.retransmissions == 0:
+            self.rtt.sample(clock() - timer.sent)
+        if seq_num != NUDGE:
+            self.congestion.acked()
+
+    def disconnect( self, packet ):
+        '''
+        Should be called on every step of the teardown process, will handle tearing down the connection
+        :param packet:
+        :return: None
+        '''
+
+        if self.on_teardown == 0:
+            if packet.is_close():
+                self.log('Attempting to disconnect...')
+
+                closeack = CLOSEACK(packet.seq_num)
+                self.server.out_socket.sendto(closeack, self.dst_ip_address)
+
+                close = CLOSE(self.get_seq_num())
+                self._send_raw_packet(close)
+
+                self.on_teardown = 1
+        elif self.on_teardown == 1:
+            if packet.is_close() and packet.is_ack():
+                self.on_teardown = 2
+                self.close()
+                self.log('Disconnected. ' + self.stats_str())
+
+    def close(self):
+        '''
+        Ends the connection, after which the server forgets it.
+        :return: None
+        '''
+        self.closed = True
+
+    def stats(self):
+        '''
+        returns the state of the connection's congestion control and retransmission timeout: cwnd and ssthresh in
+        packets, srtt, rttvar and rto in seconds (srtt and rttvar are None until a round trip time was measured), and
+        the number of packets resent so far.
+        :return: dict
+        '''
+        return {
+            'cwnd'            : self.congestion.cwnd,
+            'ssthresh'        : self.congestion.ssthresh,
+            'srtt'            : self.rtt.srtt,
+            'rttvar'          : self.rtt.rttvar,
+            'rto'             : self.rtt.rto,
+            'retransmissions' : self.retransmissions
+        }
+
+    def stats_str(self):
+        '''
+        returns the stats of the connection in a line
+        :return: str
+        '''
+        stats = self.stats()
+        if stats['srtt'] is None:
+            rtt = 'srtt -, rttvar -'
+        else:
+            rtt = 'srtt %.1f ms, rttvar %.1f ms' % (stats['srtt'] * 1000, stats['rttvar'] * 1000)
+        return 'cwnd %.1f, ssthresh %.1f, %s, rto %.1f ms, %d retransmissions' % (
+            stats['cwnd'], stats['ssthresh'], rtt, stats['rto'] * 1000, stats['retransmissions'])
+
+    def has_connection(self):
+        '''
+        indicates whether the handshake with the client is complete.
+        :return: boolean
+        '''
+        return self.on_handshake == 2
@@ -6,7 +6,7 @@ import math
 The next four functions construct and deconstruct packets.
 Packet structure is as follows:
 
-0[N][E][D][R][A][C][O]         1 byte
+[S][N][E][D][R][A][C][O]       1 byte
 [Sequence Number]              4 bytes
 [ACK Number]                   4 bytes
 [Payload Size]                 4 bytes
@@ -15,6 +15,10 @@ Packet structure is as follows:
 -----------------------------
 [ P   A   Y   L   O   A   D ] <= 955 bytes
 
+S = Selective ACK bit (on an open request and its synack: the client asks for and the
+    server agrees to cumulative ACKs; on an ACK: the ACK number is the next sequence
+    number expected, and the payload is a bitmap of the packets received after it,
+    see SACK)
 N = Packet is used to ensure the connection has not been unexpectedly terminated
 E = Packet is end-of-data
 D = Packet contains data
@@ -68,13 +72,15 @@ def construct_header( data, seq_num, ack_num, flags=[]):
 def construct_packet( data, seq_num, ack_num, flags=[] ):
     '''
     constructs a packet that is ready to send over the wire
-    :param data: str
+    :param data: bytes, or str to be encoded
     :param seq_num: int
     :param ack_num: int
     :param flags: [int]
     :return: packet
     '''
-    
+    if not isinstance( data, bytes ):
+        data = data.encode()
+
     # Construct the header
     header = construct_header( data, seq_num, ack_num, flags )
 
@@ -172,6 +178,7 @@ DATA_FLAG       = 0b00010000
 EOD_FLAG        = 0b00100000
 NUDGE_FLAG      = 0b01000000
 RESERVE_FLAG_4  = 0b10000000
+SACK_FLAG       = RESERVE_FLAG_4
 
 
 class Packet:
@@ -227,6 +234,13 @@ class Packet:
         '''
         return self.flag & EOD_FLAG
 
+    def is_sack(self):
+        '''
+        indicates if the selective ack flag was set
+        :return: boolean
+        '''
+        return self.flag & SACK_FLAG
+
     def get_raw(self):
         '''
         returns the tuple that can be used to send a packet.
@@ -249,14 +263,19 @@ class Packet:
         '''
         self.flag |= flag
 
-def SYNACK( window_size, syn_seq_num ):
+def SYNACK( window_size, syn_seq_num, sack=False ):
     '''
     returns a ready-to-send synack packet
     :param window_size: int
     :param syn_seq_num: int
+    :param sack: boolean - whether to agree to cumulative acks (see SACK)
     :return: tuple
     '''
-    return construct_packet( window_size, 0, syn_seq_num, [ OPEN_FLAG, ACK_FLAG ] )
+    flags = [ OPEN_FLAG, ACK_FLAG ]
+    if sack:
+        flags.append( SACK_FLAG )
+
+    return construct_packet( window_size, 0, syn_seq_num, flags )
 
 def ACK(seq_num):
     '''
@@ -267,6 +286,43 @@ def ACK(seq_num):
     '''
     return construct_packet('', 0, seq_num, [ACK_FLAG])
 
+def SACK(next_seq_num, received_after, eod=False):
+    '''
+    returns a ready-to-send cumulative ack, acknowledging every packet before next_seq_num and the ones after it that
+    are in received_after. Those are given as a bitmap in the payload: bit i (lowest bit first) of byte i // 8 is set
+    if next_seq_num + 1 + i has been received.
+    :param next_seq_num: int - the next sequence number expected
+    :param received_after: iterable of int - sequence numbers above next_seq_num that have been received
+    :param eod: boolean - indicates whether the last packet received had the eod flag set
+    :return: tuple
+    '''
+    bitmap = bytearray()
+    for seq_num in received_after:
+        bit = seq_num - next_seq_num - 1
+        if len(bitmap) <= bit // 8:
+            bitmap.extend(bytearray(bit // 8 + 1 - len(bitmap)))
+        bitmap[bit // 8] |= 1 << (bit % 8)
+
+    flags = [ACK_FLAG, SACK_FLAG]
+    if eod:
+        flags.append(EOD_FLAG)
+
+    return construct_packet(bytes(bitmap), 0, next_seq_num, flags)
+
+def sack_seq_nums(packet):
+    '''
+    returns the sequence numbers above the ack number that a cumulative ack (see SACK) acknowledges
+    :param packet: Packet
+    :return: [int]
+    '''
+    seq_nums = []
+    for index, byte in enumerate(bytearray(packet.payload)):
+        for bit in range(8):
+            if byte & (1 << bit):
+                seq_nums.append(packet.ack_num + 1 + index * 8 + bit)
+
+    return seq_nums
+
 def EODACK(eod_seq_num):
     '''
     returns a ready-to-send packet
@@ -328,6 +384,8 @@ class PacketIterator:
 
             return packet
 
+    # Python 3 name of next
+    __next__ = next
 
 
 '''
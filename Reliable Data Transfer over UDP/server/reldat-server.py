@@ -1,5 +1,7 @@
 #!/usr/bin/python
 
+from __future__ import print_function
+
 import socket
 import sys
 
@@ -18,7 +20,7 @@ def listen_loop( reldat_conn ):
         except KeyboardInterrupt:
             # If someone Ctrl+C's the server, gracefully exit
             break
-        except HeaderCorruptedError, PayloadCorruptedError:
+        except ( HeaderCorruptedError, PayloadCorruptedError ):
             # Do nothing if a received packet is corrupted
             pass
 
@@ -32,13 +34,18 @@ def listen_loop( reldat_conn ):
 Print server usage and quit.
 '''
 def usage():
-    print 'Usage: ./reldat-server.py <port> <max receive window size in packets>'
+    print( 'Usage: ./reldat-server.py [--asyncio] <port> <max receive window size in packets>' )
+    print( '  --asyncio: serve on an asyncio event loop (Python 3 only)' )
     sys.exit( 0 )
 
 '''
 Main function.
 '''
 def main( argv ):
+    use_asyncio = '--asyncio' in argv
+    if use_asyncio:
+        argv = [ arg for arg in argv if arg != '--asyncio' ]
+
     if len( argv ) != 2:
         usage()
 
@@ -52,6 +59,12 @@ def main( argv ):
     if port > 65535:
         usage()
 
+    if use_asyncio:
+        # Only imported when asked for, asyncio is not there on Python 2
+        from reldat_asyncio import serve
+        serve( port, max_receive_window_size )
+        return
+
     # Open a RELDAT connection with our max window size
     reldat_conn = reldat.Reldat( max_receive_window_size )
     
@@ -63,5 +76,4 @@ def main( argv ):
 
 if __name__ == '__main__':
     main( sys.argv[1:] )
-
-sys.exit( 0 )
+    sys.exit( 0 )
@@ -0,0 +1,175 @@
+'''
+The RELDAT server on an asyncio event loop (Python 3 only). The protocol is the same as that of reldat.py, and so is the
+state of each connection, but nothing is polled: packets are handled the moment they arrive, every packet waiting for
+an acknowledgement has its own timer on the loop that resends it when it runs out, and a client is nudged by a timer
+once it has been quiet for too long. An idle server does no work at all.
+'''
+import asyncio
+import socket
+
+from connection import ReldatConnection, ACK_DELAY
+from packet import construct_packet, HeaderCorruptedError, PayloadCorruptedError, NUDGE_FLAG
+from reldat import Reldat
+from timers import clock
+
+
+class AsyncioReldatConnection( ReldatConnection ):
+    '''
+    ReldatConnection driven by timers on the server's event loop instead of by resend_packets and check_connection.
+    '''
+    def __init__( self, server, address ):
+        super( AsyncioReldatConnection, self ).__init__( server, address )
+        # Sequence number (or NUDGE) -> the loop timer that resends that packet
+        self._handles      = {}
+        self._nudge_handle = None
+        self._ack_handle   = None
+        self._schedule_nudge()
+
+    def receive( self, packet ):
+        super( AsyncioReldatConnection, self ).receive( packet )
+        if not self.closed:
+            self._schedule_nudge()
+
+    def _start_timer(self, seq_num, packet):
+        timer = super( AsyncioReldatConnection, self )._start_timer( seq_num, packet )
+        self._cancel_handle(seq_num)
+        self._handles[seq_num] = self.server.loop.call_later(max(timer.deadline - clock(), 0), self._timer_expired,
+                                                             seq_num)
+        return timer
+
+    def _stop_timer(self, seq_num):
+        super( AsyncioReldatConnection, self )._stop_timer( seq_num )
+        self._cancel_handle(seq_num)
+
+    def _cancel_handle(self, seq_num):
+        handle = self._handles.pop(seq_num, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _timer_expired(self, seq_num):
+        '''
+        Resends a packet whose ack did not come in time, or closes the connection (see
+        ReldatConnection._timer_ran_out).
+        :param seq_num: int - sequence number of the packet, or NUDGE
+        :return: None
+        '''
+        self._handles.pop(seq_num, None)
+        timer = self.timers.get(seq_num)
+        if timer is None or self.closed:
+            return
+        self._timer_ran_out(timer)
+        self.server._forget_if_closed(self)
+
+    def _delay_ack(self):
+        super( AsyncioReldatConnection, self )._delay_ack()
+        self._ack_handle = self.server.loop.call_later(ACK_DELAY, self.flush_ack)
+
+    def flush_ack(self, eod=False):
+        if self._ack_handle is not None:
+            self._ack_handle.cancel()
+            self._ack_handle = None
+        super( AsyncioReldatConnection, self ).flush_ack( eod )
+
+    def _schedule_nudge(self):
+        '''
+        (Re)starts the timer that nudges the client once it has been quiet for the timeout
+        :return: None
+        '''
+        if self._nudge_handle is not None:
+            self._nudge_handle.cancel()
+        self._nudge_handle = self.server.loop.call_later(self.server.timeout, self._nudge)
+
+    def _nudge(self):
+        '''
+        Nudges the client, unless packets are still waiting for an ack (whose timers take care of a client that has
+        gone away) or the handshake is not done yet, in which case it checks again after another timeout.
+        :return: None
+        '''
+        self._nudge_handle = None
+        if self.closed:
+            return
+        if self.has_connection() and len(self.timers) == 0:
+            self.log('Nudging client.')
+            self._send_raw_packet(construct_packet("", 0, 0, [NUDGE_FLAG]))
+        else:
+            self._schedule_nudge()
+
+    def close(self):
+        super( AsyncioReldatConnection, self ).close()
+        for handle in self._handles.values():
+            handle.cancel()
+        self._handles = {}
+        if self._nudge_handle is not None:
+            self._nudge_handle.cancel()
+            self._nudge_handle = None
+        if self._ack_handle is not None:
+            self._ack_handle.cancel()
+            self._ack_handle = None
+
+
+class AsyncioReldat( Reldat, asyncio.DatagramProtocol ):
+    '''
+    The reldat server as a DatagramProtocol. in_socket and out_socket are the transports of the two datagram endpoints
+    (they have the same sendto as a socket), so the connections send through them just the same.
+    '''
+    connection_class = AsyncioReldatConnection
+
+    def __init__( self, max_window_size, loop ):
+        Reldat.__init__( self, max_window_size )
+        self.loop = loop
+
+    async def start( self, port ):
+        '''
+        Opens the in and out endpoints, with the in endpoint at the indicated port.
+        :param port: int
+        :return: None
+        '''
+        self.port = port
+        self.in_socket, _  = await self.loop.create_datagram_endpoint( lambda: self,
+                                                                       local_addr=( self.src_ip_address, port ) )
+        self.out_socket, _ = await self.loop.create_datagram_endpoint( asyncio.DatagramProtocol, family=socket.AF_INET )
+
+        print( 'Listening on port ' + str( self.port ) + '.' )
+
+    def datagram_received( self, data, address ):
+        try:
+            self.handle_datagram( data, address )
+        except ( HeaderCorruptedError, PayloadCorruptedError ):
+            # Do nothing if a received packet is corrupted
+            pass
+
+    def error_received( self, exc ):
+        # Errors of earlier sends (e.g. an unreachable client) are dealt with by the timers
+        pass
+
+    def close( self ):
+        '''
+        Closes every connection and both endpoints.
+        :return: None
+        '''
+        for connection in list( self.connections.values() ):
+            connection.close()
+        self.connections = {}
+        for transport in ( self.in_socket, self.out_socket ):
+            if transport is not None:
+                transport.close()
+
+
+def serve( port, max_window_size ):
+    '''
+    Runs the server until it is interrupted.
+    :param port: int
+    :param max_window_size: int
+    :return: None
+    '''
+    loop   = asyncio.new_event_loop()
+    server = AsyncioReldat( max_window_size, loop )
+    try:
+        loop.run_until_complete( server.start( port ) )
+        loop.run_forever()
+    except KeyboardInterrupt:
+        # If someone Ctrl+C's the server, gracefully exit
+        pass
+    finally:
+        server.close()
+        loop.close()
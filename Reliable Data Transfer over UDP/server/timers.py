@@ -0,0 +1,143 @@
+'''
+Retransmission timers of a connection: a heap of deadlines on a monotonic clock, keyed by sequence number. Starting,
+restarting and stopping a timer are O(1) (plus a heap push), and finding the timers that have run out only looks at
+those, however many packets are waiting for an acknowledgement.
+'''
+import time
+from heapq import heappush, heappop, heapify
+
+# Monotonic clock in seconds, so timeouts are not thrown off by changes to the system time (Python 2 has no monotonic
+# clock and falls back to the system time)
+clock = getattr( time, 'monotonic', time.time )
+
+# Key of the timer of a nudge, which has no sequence number of its own
+NUDGE = -1
+
+
+class Timer( object ):
+    '''
+    The timer of one packet waiting for an acknowledgement
+    '''
+    __slots__ = ( 'key', 'packet', 'first_sent', 'sent', 'deadline', 'retransmissions', 'pending' )
+
+    def __init__( self, key, packet, sent, deadline ):
+        self.key             = key
+        self.packet          = packet
+        # When the packet was first and last sent
+        self.first_sent      = sent
+        self.sent            = sent
+        self.deadline        = deadline
+        self.retransmissions = 0
+        # Whether the deadline is still to come, i.e. the timer has not been returned by expired since it was started
+        self.pending         = True
+
+
+class RetransmissionTimers( object ):
+    '''
+    The timers of the packets a connection is waiting on acknowledgements for, by key (the sequence number of the packet,
+    or NUDGE). A stopped or restarted timer leaves its old deadline in the heap, which is skipped when it comes up, and
+    the heap is rebuilt once such deadlines make up most of it.
+    '''
+    def __init__( self, timeout ):
+        '''
+        :param timeout: float - seconds until a timer runs out, unless start is given another timeout
+        '''
+        self.timeout = timeout
+        self._timers = {}
+        self._heap   = []
+
+    def __len__( self ):
+        return len( self._timers )
+
+    def __contains__( self, key ):
+        return key in self._timers
+
+    def __iter__( self ):
+        return iter( list( self._timers ) )
+
+    def get( self, key ):
+        '''
+        :param key: int
+        :return: Timer, or None if there is no such timer
+        '''
+        return self._timers.get( key )
+
+    def start( self, key, packet, now=None, timeout=None ):
+        '''
+        Starts the timer of a packet that was just sent, or restarts it (counting a retransmission) if it is running.
+        :param key: int - sequence number of the packet, or NUDGE
+        :param packet: the packet as it was sent
+        :param now: float - the current time of clock, if already known
+        :param timeout: float - seconds until the timer runs out, the timeout of the timers if None
+        :return: Timer
+        '''
+        if now is None:
+            now = clock()
+        deadline = now + ( self.timeout if timeout is None else timeout )
+        timer = self._timers.get( key )
+        if timer is None:
+            timer = self._timers[key] = Timer( key, packet, now, deadline )
+        else:
+            timer.sent     = now
+            timer.deadline = deadline
+            timer.pending  = True
+            timer.retransmissions += 1
+        heappush( self._heap, ( deadline, key ) )
+        if len( self._heap ) > 2 * len( self._timers ) + 16:
+            self._compact()
+        return timer
+
+    def stop( self, key ):
+        '''
+        Stops a timer. Does nothing if there is no such timer.
+        :param key: int
+        :return: Timer, or None if there was no such timer
+        '''
+        return self._timers.pop( key, None )
+
+    def expired( self, now=None ):
+        '''
+        Returns the timers that have run out, in the order they ran out in. They keep running until they are restarted
+        or stopped, but are only returned again once they are restarted and run out again.
+        :param now: float - the current time of clock, if already known
+        :return: [Timer...]
+        '''
+        if now is None:
+            now = clock()
+        heap = self._heap
+        expired = []
+        while heap and heap[0][0] <= now:
+            deadline, key = heappop( heap )
+            timer = self._timers.get( key )
+            # Skip the deadlines of timers that were stopped or restarted since
+            if timer is not None and timer.pending and timer.deadline == deadline:
+                timer.pending = False
+                expired.append( timer )
+        return expired
+
+    def next_deadline( self ):
+        '''
+        Returns the deadline of the timer that runs out first, dropping the deadlines of stopped or restarted timers
+        it comes across.
+        :return: float, or None if no timer is waiting to run out
+        '''
+        heap = self._heap
+        while heap:
+            deadline, key = heap[0]
+            timer = self._timers.get( key )
+            if timer is not None and timer.pending and timer.deadline == deadline:
+                return deadline
+            heappop( heap )
+        return None
+
+    def clear( self ):
+        '''
+        Stops every timer.
+        :return: None
+        '''
+        self._timers = {}
+        self._heap   = []
+
+    def _compact( self ):
+        self._heap = [ ( timer.deadline, key ) for key, timer in self._timers.items() if timer.pending ]
+        heapify( self._heap )